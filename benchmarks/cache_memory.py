@@ -0,0 +1,39 @@
+"""Bytes per cached message: full discord.Message objects vs CachedMessage records.
+
+Usage: python -m benchmarks.cache_memory [count]
+"""
+import gc
+import sys
+import tracemalloc
+from benchmarks.synthetic import make_state, make_guild, make_channel, generate_messages
+from util.cached_message import CachedMessage
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+
+def main(count: int = 5000):
+    state = make_state()
+    channel = make_channel(state, make_guild(state), 200000000000000000)
+
+    full = measure(lambda: generate_messages(state, channel, count))
+    # The discord.Message objects are dropped right after conversion, so only the records stay resident
+    compact = measure(lambda: [CachedMessage.from_message(m) for m in generate_messages(state, channel, count)])
+
+    print(f"{count} messages")
+    print(f"discord.Message: {full / count:10.0f} bytes/message  ({full / 1e6:.1f} MB)")
+    print(f"CachedMessage:   {compact / count:10.0f} bytes/message  ({compact / 1e6:.1f} MB)")
+    print(f"reduction:       {full / compact:10.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
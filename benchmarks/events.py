@@ -0,0 +1,113 @@
+"""Gateway event streams for replay against the bot's event handlers.
+
+Events are gateway dispatch frames, {"op": 0, "t": type, "d": payload}, plus "ts",
+the seconds since the start of the stream. Streams are stored one frame per line
+(JSONL), so dispatches captured from a live gateway connection can be replayed as is.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+import discord
+from benchmarks.synthetic import CUSTOM_EMOJIS, GUILD_ID, UNICODE_EMOJIS, FIRST_MESSAGE_ID, message_id_at, payload_at
+
+# Share of each event type in a synthetic stream, roughly what an active server sends
+EVENT_MIX = {
+    "MESSAGE_REACTION_ADD": 0.70,
+    "MESSAGE_REACTION_REMOVE": 0.15,
+    "MESSAGE_CREATE": 0.08,
+    "MESSAGE_UPDATE": 0.05,
+    "MESSAGE_REACTION_REMOVE_ALL": 0.01,
+    "MESSAGE_REACTION_REMOVE_EMOJI": 0.01,
+}
+
+
+def random_emoji(rng: random.Random) -> dict:
+    if rng.random() < 0.25:
+        name, emoji_id = rng.choice(CUSTOM_EMOJIS)
+        return {"id": str(emoji_id), "name": name, "animated": False}
+    return {"id": None, "name": rng.choice(UNICODE_EMOJIS)}
+
+
+def synthetic_events(channels: dict, count: int, seed: int = 0, per_second: float = 50.0) -> list:
+    """Generate `count` events over {channel id: message count}, mostly reactions to recent messages."""
+    rng = random.Random(seed)
+    newest = dict(channels)
+    channel_ids = list(channels)
+    kinds, weights = list(EVENT_MIX), list(EVENT_MIX.values())
+    events = []
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        channel_id = rng.choice(channel_ids)
+        if kind == "MESSAGE_CREATE":
+            newest[channel_id] += 1
+            data = payload_at(newest[channel_id], channel_id, seed)
+            data["reactions"] = []
+        else:
+            # Activity concentrates on the last few hundred messages
+            index = max(1, newest[channel_id] - int(rng.expovariate(1 / 200)))
+            message_id = message_id_at(index)
+            data = {"channel_id": str(channel_id), "message_id": str(message_id), "guild_id": str(GUILD_ID)}
+            if kind in ("MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE"):
+                data["user_id"] = str(rng.randrange(200) + 1)
+                data["emoji"] = random_emoji(rng)
+            elif kind == "MESSAGE_REACTION_REMOVE_EMOJI":
+                data["emoji"] = random_emoji(rng)
+            elif kind == "MESSAGE_UPDATE":
+                data = {"id": data["message_id"], "channel_id": data["channel_id"], "guild_id": data["guild_id"], "content": "edited"}
+        events.append({"op": 0, "t": kind, "d": data, "ts": i / per_second})
+    return events
+
+
+def save_events(path: str, events: list):
+    with open(path, "w", encoding="utf-8") as file:
+        for event in events:
+            file.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def load_events(path: str) -> list:
+    """Read a JSONL stream, skipping non-dispatch frames and event types the bot doesn't handle."""
+    with open(path, encoding="utf-8") as file:
+        frames = [json.loads(line) for line in file if line.strip()]
+    return [frame for frame in frames if frame.get("op", 0) == 0 and frame.get("t") in EVENT_MIX]
+
+
+async def dispatch(bot, kind: str, data: dict):
+    """Build the object discord.py would pass for one dispatch and await the bot's handler; returns the handler's run time."""
+    if kind == "MESSAGE_CREATE":
+        channel = bot.get_channel(int(data["channel_id"]))
+        if hasattr(channel, "count"):
+            # Later fetches of the new message should find it
+            channel.count = max(channel.count, (int(data["id"]) - FIRST_MESSAGE_ID) >> 22)
+        event, handler = discord.Message(state=bot._connection, channel=channel, data=data), bot.on_message
+    elif kind == "MESSAGE_UPDATE":
+        event, handler = discord.RawMessageUpdateEvent(data), bot.on_raw_message_edit
+    elif kind == "MESSAGE_REACTION_ADD":
+        event, handler = discord.RawReactionActionEvent(data, discord.PartialEmoji.from_dict(data["emoji"]), "REACTION_ADD"), bot.on_raw_reaction_add
+    elif kind == "MESSAGE_REACTION_REMOVE":
+        event, handler = discord.RawReactionActionEvent(data, discord.PartialEmoji.from_dict(data["emoji"]), "REACTION_REMOVE"), bot.on_raw_reaction_remove
+    elif kind == "MESSAGE_REACTION_REMOVE_ALL":
+        event, handler = discord.RawReactionClearEvent(data), bot.on_raw_reaction_clear
+    else:
+        event, handler = discord.RawReactionClearEmojiEvent(data, discord.PartialEmoji.from_dict(data["emoji"])), bot.on_raw_reaction_clear_emoji
+
+    start = time.perf_counter()
+    await handler(event)
+    return time.perf_counter() - start
+
+
+async def replay(bot, events: list, paced: bool = False) -> dict:
+    """Feed events to the bot's handlers, as fast as possible or at their recorded pace.
+
+    Returns {event type: [handler seconds]}. The loop yields between events, as it
+    would between gateway frames, so debounced refetches and store writes run along.
+    """
+    latencies = defaultdict(list)
+    start = time.perf_counter()
+    for event in events:
+        if paced:
+            await asyncio.sleep(max(0.0, event.get("ts", 0) - (time.perf_counter() - start)))
+        latencies[event["t"]].append(await dispatch(bot, event["t"], event["d"]))
+        await asyncio.sleep(0)
+    return latencies
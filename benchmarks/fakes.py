@@ -0,0 +1,121 @@
+"""Local stand-ins for the Discord objects the bot talks to, so commands and event handlers run offline.
+
+SyntheticTextChannel is a real discord.TextChannel (so isinstance checks and get_channel
+work) whose history() and fetch_message() serve generated messages instead of calling
+the REST API. FakeInteraction records what /top sends and edits.
+"""
+import asyncio
+import time
+import discord
+from benchmarks.synthetic import FIRST_MESSAGE_ID, message_id_at, payload_at
+
+PAGE_SIZE = 100
+
+
+class NotFoundResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class SyntheticTextChannel(discord.TextChannel):
+    """A text channel whose history is `count` synthetic messages, built only when requested.
+
+    Every history page and fetch_message counts as one REST request and can
+    sleep `latency` seconds to model the round trip.
+    """
+
+    def __init__(self, *, state, guild, data, count: int = 0, seed: int = 0, latency: float = 0.0):
+        super().__init__(state=state, guild=guild, data=data)
+        self.count = count
+        self.seed = seed
+        self.latency = latency
+        self.requests = 0
+        self.messages_built = 0
+
+    async def _request(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def message_at(self, index: int) -> discord.Message:
+        self.messages_built += 1
+        return discord.Message(state=self._state, channel=self, data=payload_at(index, self.id, self.seed))
+
+    async def history(self, *, limit=100, before=None, after=None, around=None, oldest_first=None):
+        # Indexes of the messages strictly between after and before
+        high = self.count if before is None else min(self.count, (before.id - FIRST_MESSAGE_ID - 1) >> 22)
+        low = 1 if after is None else max(1, ((after.id - FIRST_MESSAGE_ID) >> 22) + 1)
+        if oldest_first is None:
+            oldest_first = after is not None
+        indexes = range(low, high + 1) if oldest_first else range(high, low - 1, -1)
+        if limit is not None:
+            indexes = indexes[:limit]
+        for position, index in enumerate(indexes):
+            if position % PAGE_SIZE == 0:
+                await self._request()
+            yield self.message_at(index)
+
+    async def fetch_message(self, id: int, /) -> discord.Message:
+        await self._request()
+        index = (id - FIRST_MESSAGE_ID) >> 22
+        if not 1 <= index <= self.count or message_id_at(index) != id:
+            raise discord.NotFound(NotFoundResponse(), "Unknown Message")
+        return self.message_at(index)
+
+    def permissions_for(self, obj, /) -> discord.Permissions:
+        return discord.Permissions.all()
+
+
+class FakeMessage:
+    """A sent followup; remembers when it was edited and what it showed last. Edits take `latency` seconds."""
+
+    def __init__(self, content=None, embeds=None, latency: float = 0.0):
+        self.content = content
+        self.embeds = embeds or []
+        self.latency = latency
+        self.edit_times = []
+
+    async def edit(self, *, content=None, embeds=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.edit_times.append(time.perf_counter())
+        if content is not None:
+            self.content = content
+        if embeds is not None:
+            self.embeds = embeds
+        return self
+
+
+class FakeFollowup:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.messages = []
+
+    async def send(self, content=None, *, embeds=None, ephemeral=False):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = FakeMessage(content, embeds, self.latency)
+        self.messages.append(message)
+        return message
+
+
+class FakeInteractionResponse:
+    def __init__(self):
+        self.deferred = False
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        self.deferred = True
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the slash command callbacks."""
+
+    def __init__(self, channel, latency: float = 0.0):
+        self.channel = channel
+        self.guild = channel.guild
+        self.response = FakeInteractionResponse()
+        self.followup = FakeFollowup(latency)
+
+    @property
+    def last_message(self) -> FakeMessage:
+        return self.followup.messages[-1] if self.followup.messages else None
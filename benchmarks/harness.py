@@ -0,0 +1,184 @@
+"""End-to-end offline benchmark: /top, ReactionProcessor and the gateway event handlers on a synthetic guild.
+
+Usage: python -m benchmarks.harness [--messages 10000 100000 1000000] [--events 20000] [--latency-ms 0]
+                                    [--cache-size N] [--offload-min N] [--repeat 30] [--record FILE | --replay FILE [--paced]]
+
+Each --messages size becomes one channel with that much history. The real TopReactionsBot and
+FetchReactionsCog run against it through the stand-ins in benchmarks.fakes, with the persistent
+store in a temporary directory. --latency-ms adds a sleep to every simulated REST request.
+Event loop lag is sampled throughout, to show how long commands keep gateway heartbeats waiting.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import discord
+from benchmarks import events as event_streams
+from benchmarks.fakes import FakeInteraction, SyntheticTextChannel
+from benchmarks.synthetic import make_guild, make_channel, message_id_at
+from config import config
+from util.loop_monitor import LoopLagMonitor
+from slash_commands import fetch_reactions
+from util.reaction_processor import ReactionProcessor
+
+FIRST_CHANNEL_ID = 200000000000000000
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def queries(channel) -> dict:
+    since = discord.utils.snowflake_time(message_id_at(max(1, channel.count - 2000))).isoformat()
+    return {
+        "default": {},
+        "scored": {"scored": True},
+        "only=🔥 pog 👍": {"only": "🔥 pog 👍"},
+        "include/exclude": {"include": "🔥 😂", "exclude": "👎"},
+        "limit=1000": {"limit": 1000},
+        "since (last 2000)": {"since": since},
+    }
+
+
+async def make_bot(directory: str, cache_size: int, offload_min: int):
+    # Everything the bot reads from config at construction has to be set first
+    config.CACHE_DB_PATH = os.path.join(directory, "bench.db")
+    config.RECONCILE_INTERVAL_MINUTES = 0
+    config.WARMUP_ENABLED = False
+    config.REFRESH_DEBOUNCE_SECONDS = 0
+    if cache_size:
+        config.MAX_MESSAGES = fetch_reactions.MAX_MESSAGES = cache_size
+    if offload_min is not None:
+        config.OFFLOAD_MIN_MESSAGES = offload_min
+
+    from main import TopReactionsBot
+    bot = TopReactionsBot()
+    # Normally set on login; on_message and command processing compare authors against it
+    bot._connection.user = discord.ClientUser(state=bot._connection, data={
+        "id": "1", "username": "bench", "discriminator": "0", "avatar": None, "bot": True})
+    await bot.add_cog(fetch_reactions.FetchReactionsCog(bot))
+    return bot, bot.get_cog("FetchReactionsCog")
+
+
+async def run_top(cog, channel, latency: float, **options) -> tuple:
+    """Run /top once; returns its duration and the FakeInteraction it answered."""
+    interaction = FakeInteraction(channel, latency)
+    start = time.perf_counter()
+    await cog.get_top_reaction_posts.callback(cog, interaction, **options)
+    return time.perf_counter() - start, interaction
+
+
+async def bench_top(bot, cog, channel, latency: float, repeat: int, monitor: LoopLagMonitor):
+    print(f"\n== /top in a channel with {channel.count} messages of history ==")
+    monitor.reset()
+    start = time.perf_counter()
+    seconds, interaction = await run_top(cog, channel, latency)
+    cache = bot.channel_messages[channel.id]
+    # Every edit but the last is a preview
+    previews = interaction.last_message.edit_times[:-1]
+    first_preview = f"first preview at {(previews[0] - start) * 1000:.0f} ms" if previews else "no preview"
+    print(f"cold (history crawl)     {seconds * 1000:9.1f} ms   {channel.requests} REST requests, "
+          f"{channel.messages_built} messages built, {len(cache)} cached; {first_preview}, {len(previews)} previews")
+    print(f"event loop lag during the crawl: {monitor.stats()}")
+
+    print(f"{'warm query':24} {'p50 ms':>9} {'p95 ms':>9} {'queries/s':>10} {'cached p50 ms':>14} {'worst loop lag ms':>18}")
+    for label, options in queries(channel).items():
+        monitor.reset()
+        uncached = []
+        for _ in range(repeat):
+            bot.query_cache.discard(channel.id)
+            uncached.append((await run_top(cog, channel, latency, **options))[0])
+            # Let the monitor wake up and see how long that query held the loop
+            await asyncio.sleep(monitor.interval)
+        cached = [(await run_top(cog, channel, latency, **options))[0] for _ in range(repeat)]
+        print(f"{label:24} {percentile(uncached, 0.5) * 1000:9.2f} {percentile(uncached, 0.95) * 1000:9.2f} "
+              f"{repeat / sum(uncached):10.0f} {percentile(cached, 0.5) * 1000:14.3f} {monitor.worst * 1000:18.1f}")
+    print(f"memory: cache ~{cache.estimated_bytes() / 2**20:.1f} MB, process max RSS {max_rss_mb():.0f} MB")
+
+
+def bench_reaction_processor(messages: list):
+    print(f"\n== ReactionProcessor over {len(messages)} cached messages ==")
+    for label, fn in (("calculate_score", ReactionProcessor.calculate_score),
+                      ("calculate_score only=", lambda msg: ReactionProcessor.calculate_score(msg, {"🔥", "pog"})),
+                      ("process_reactions", ReactionProcessor.process_reactions)):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        seconds = time.perf_counter() - start
+        print(f"{label:24} {len(messages) / seconds:12.0f} messages/s")
+
+
+async def bench_events(bot, channels: list, events: list, paced: bool):
+    print(f"\n== Replay of {len(events)} gateway events over {len(channels)} channels ==")
+    requests_before = sum(channel.requests for channel in channels)
+    start = time.perf_counter()
+    latencies = await event_streams.replay(bot, events, paced)
+    handled = time.perf_counter() - start
+    await bot.refresher.drain()
+    await bot.saver.drain()
+    drained = time.perf_counter() - start - handled
+
+    print(f"{'event':32} {'count':>7} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for kind, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        print(f"{kind:32} {len(values):7} {percentile(values, 0.5) * 1e6:9.1f} {percentile(values, 0.99) * 1e6:9.1f} {max(values) * 1e6:9.1f}")
+    print(f"throughput {len(events) / handled:.0f} events/s; {drained * 1000:.0f} ms more to drain queued refetches and writes; "
+          f"{sum(channel.requests for channel in channels) - requests_before} REST requests")
+    print(f"memory: cache ~{bot.channel_messages.estimated_bytes() / 2**20:.1f} MB, process max RSS {max_rss_mb():.0f} MB")
+
+
+async def main(args):
+    # The per-message INFO logs would otherwise dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    latency = args.latency_ms / 1000
+    with tempfile.TemporaryDirectory() as directory:
+        bot, cog = await make_bot(directory, args.cache_size, args.offload_min)
+        monitor = LoopLagMonitor(0.005)
+        monitor.start()
+        guild = make_guild(bot._connection)
+        channels = [make_channel(bot._connection, guild, FIRST_CHANNEL_ID + i, f"bench-{count}", SyntheticTextChannel,
+                                 count=count, seed=i, latency=latency)
+                    for i, count in enumerate(args.messages)]
+
+        for channel in channels:
+            await bench_top(bot, cog, channel, latency, args.repeat, monitor)
+
+        largest = max(channels, key=lambda channel: len(bot.channel_messages[channel.id]))
+        bench_reaction_processor(bot.channel_messages[largest.id].recent())
+
+        if args.replay:
+            events = event_streams.load_events(args.replay)
+        else:
+            events = event_streams.synthetic_events({channel.id: channel.count for channel in channels}, args.events)
+            if args.record:
+                event_streams.save_events(args.record, events)
+        monitor.reset()
+        await bench_events(bot, channels, events, args.paced)
+        print(f"event loop lag during the replay: {monitor.stats()}")
+        await monitor.stop()
+
+        await bot.remove_cog("FetchReactionsCog")
+        bot.store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[10000, 100000, 1000000], help="history size of each channel")
+    parser.add_argument("--events", type=int, default=20000, help="synthetic events to replay")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated round trip of every REST request")
+    parser.add_argument("--cache-size", type=int, default=0, help="override MAX_MESSAGES, the per-channel cache size")
+    parser.add_argument("--offload-min", type=int, help="override OFFLOAD_MIN_MESSAGES, the cache size from which work moves to a thread")
+    parser.add_argument("--repeat", type=int, default=30, help="runs per warm /top query")
+    parser.add_argument("--record", help="save the synthetic event stream to this JSONL file")
+    parser.add_argument("--replay", help="replay this JSONL event stream instead of a synthetic one")
+    parser.add_argument("--paced", action="store_true", help="replay events at their recorded pace")
+    asyncio.run(main(parser.parse_args(sys.argv[1:])))
@@ -0,0 +1,77 @@
+"""Time spent on the event loop per logged gateway event: synchronous handlers vs the queued pipeline.
+
+Usage: python -m benchmarks.logging_overhead [events]
+
+Console output goes to a file in a temporary directory too, so a slow terminal doesn't skew the numbers.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from logger import setup_logging, stop_logging
+
+logger = logging.getLogger()
+
+
+def reset_root():
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def synchronous(directory: str):
+    """What main.py configured before: a plain file handler and a console handler, written on the calling thread."""
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    for handler in (logging.FileHandler(os.path.join(directory, "sync.log"), encoding='utf-8', mode='w'),
+                    logging.StreamHandler(open(os.path.join(directory, "sync.console"), "w"))):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def queued(directory: str, events_per_second: int = 0):
+    setup_logging(filename=os.path.join(directory, "queued.log"), json_format=False, events_per_second=events_per_second,
+                  stream=open(os.path.join(directory, "queued.console"), "w"))
+
+
+def run(events: int) -> tuple:
+    """Return the mean, p99 and worst time of one logging call, in microseconds."""
+    timings = []
+    for i in range(events):
+        channel_id = 200000000000000000 + i % 50
+        start = time.perf_counter()
+        logger.info(f"Reaction add event in {channel_id}", extra={"event": "reaction_add", "channel_id": channel_id, "message_id": i})
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return sum(timings) / events * 1e6, timings[int(events * 0.99)] * 1e6, timings[-1] * 1e6
+
+
+def main(events: int = 20000):
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+
+        synchronous(directory)
+        results["synchronous file + console"] = run(events)
+        reset_root()
+
+        queued(directory)
+        results["queued, every event"] = run(events)
+        drain = time.perf_counter()
+        stop_logging()
+        drain = time.perf_counter() - drain
+
+        queued(directory, events_per_second=5)
+        results["queued, 5 events/s sampled"] = run(events)
+        stop_logging()
+        reset_root()
+
+    print(f"{events} reaction events, one log line each; time on the event loop per event")
+    print(f"{'':28} {'mean':>8} {'p99':>8} {'max':>8}  (us)")
+    for label, (mean, p99, worst) in results.items():
+        print(f"{label:28} {mean:8.1f} {p99:8.1f} {worst:8.1f}")
+    print(f"(the background writer needed another {drain * 1000:.0f} ms to drain the unsampled queue)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,62 @@
+"""Per-message Python scoring vs the batched ReactionMatrix path for /top queries with only=.
+
+Usage: python -m benchmarks.scoring [count ...]
+"""
+import sys
+import time
+from benchmarks.synthetic import generate_cached_messages
+from slash_commands.fetch_reactions import FetchReactionsCog
+from util.channel_cache import ChannelCache
+from util.reaction_matrix import ReactionMatrix
+from util.reaction_processor import ReactionProcessor
+
+QUERIES = {
+    "scored only": dict(scored=True, only_set={"🔥", "pog", "👍"}),
+    "count only": dict(only_set={"😂", "kekw"}),
+    "scored only include exclude": dict(scored=True, only_set={"🔥", "pog"}, include_set={"🔥"}, exclude_set={"👎"}),
+}
+
+
+def python_rank(messages, show, scored=False, include_set=None, exclude_set=None, only_set=None):
+    """The list-comprehension ranking /top used before the reaction matrix."""
+    if include_set:
+        messages = [msg for msg in messages if any(ReactionProcessor.get_emoji_name(r) in include_set for r in msg.reactions)]
+    if exclude_set:
+        messages = [msg for msg in messages if not any(ReactionProcessor.get_emoji_name(r) in exclude_set for r in msg.reactions)]
+    if scored:
+        score_fn = lambda msg: ReactionProcessor.calculate_score(msg, only_set)
+    else:
+        score_fn = lambda msg: sum(r.count for r in msg.reactions if ReactionProcessor.get_emoji_name(r) in only_set)
+    scored_messages = [(msg, score_fn(msg)) for msg in messages]
+    if scored:
+        scored_messages = [(msg, score) for msg, score in scored_messages if score > 0]
+    return [msg for msg, _ in sorted(scored_messages, key=lambda x: x[1], reverse=True)[:show]]
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(counts):
+    for count in counts:
+        messages = generate_cached_messages(count)
+        cache = ChannelCache(count, messages)
+        newest_first = cache.recent()
+        build = best_of(lambda: ReactionMatrix(messages), repeat=1)
+        cache.matrix()
+
+        print(f"{count} messages (matrix build {build * 1000:.1f} ms, once per cache change)")
+        for name, query in QUERIES.items():
+            python = best_of(lambda: python_rank(newest_first, 10, **query))
+            matrix = best_of(lambda: FetchReactionsCog.rank_messages(cache, 10, **query))
+            assert [m.id for m in python_rank(newest_first, 10, **query)] == [m.id for m, _ in FetchReactionsCog.rank_messages(cache, 10, **query)]
+            print(f"  {name:30} python {python * 1000:9.1f} ms   matrix {matrix * 1000:8.1f} ms   {python / matrix:6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [5000, 50000, 500000])
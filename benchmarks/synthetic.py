@@ -0,0 +1,124 @@
+"""Synthetic Discord data for offline benchmarks.
+
+Builds real discord.Message objects from generated gateway payloads, using a
+ConnectionState that never connects.
+"""
+import random
+import discord
+from util.cached_message import CachedMessage, CachedReaction, EMOJI_TABLE
+
+GUILD_ID = 100000000000000000
+FIRST_MESSAGE_ID = 1100000000000000000
+
+UNICODE_EMOJIS = ["👍", "❤️", "😂", "🔥", "😮", "😢", "👀", "🎉", "👎", "🤮", "🤢", "💯"]
+CUSTOM_EMOJIS = [("fuckyes", 900000000000000001), ("pog", 900000000000000002), ("kekw", 900000000000000003),
+                 ("catjam", 900000000000000004), ("sadge", 900000000000000005)]
+REGIONAL_INDICATORS = [chr(c) for c in range(0x1F1E6, 0x1F1EE)]
+WORDS = ["lol", "this", "is", "the", "best", "thing", "i", "have", "ever", "seen", "anyway", "who", "wants", "to",
+         "play", "tonight", "gg", "no", "way", "look", "at", "that", "meme", "pog", "honestly", "what", "a", "clip"]
+
+
+def make_state() -> discord.state.ConnectionState:
+    return discord.Client(intents=discord.Intents.default())._connection
+
+
+def make_guild(state, guild_id: int = GUILD_ID) -> discord.Guild:
+    emojis = [{"id": str(emoji_id), "name": name, "animated": False, "available": True, "roles": []}
+              for name, emoji_id in CUSTOM_EMOJIS]
+    guild = discord.Guild(data={"id": str(guild_id), "name": "bench", "emojis": emojis, "roles": [], "channels": []}, state=state)
+    for emoji in guild.emojis:
+        state._emojis[emoji.id] = emoji
+    # Registered with the state so get_channel and get_emoji find it, as for a guild received over the gateway
+    state._add_guild(guild)
+    return guild
+
+
+def make_channel(state, guild, channel_id: int, name: str = "bench", channel_class=discord.TextChannel, **kwargs) -> discord.TextChannel:
+    channel = channel_class(state=state, guild=guild, data={
+        "id": str(channel_id), "type": 0, "name": name, "position": 0, "guild_id": str(guild.id),
+    }, **kwargs)
+    guild._add_channel(channel)
+    return channel
+
+
+def random_reactions(rng: random.Random) -> list:
+    """Heavy-tailed reaction counts: most messages get none, a few get a lot."""
+    if rng.random() < 0.05:
+        # A poll: a handful of regional indicators with similar counts
+        return [{"count": rng.randint(1, 30), "me": False, "emoji": {"id": None, "name": e}}
+                for e in REGIONAL_INDICATORS[:rng.randint(2, 6)]]
+
+    kinds = min(int(rng.paretovariate(1.2)) - 1, 12)
+    reactions = []
+    for _ in range(max(kinds, 0)):
+        count = min(int(rng.paretovariate(1.1)), 500)
+        if rng.random() < 0.25:
+            name, emoji_id = rng.choice(CUSTOM_EMOJIS)
+            emoji = {"id": str(emoji_id), "name": name, "animated": False}
+        else:
+            emoji = {"id": None, "name": rng.choice(UNICODE_EMOJIS)}
+        if all(r["emoji"] != emoji for r in reactions):
+            reactions.append({"count": count, "me": False, "emoji": emoji})
+    return reactions
+
+
+def message_payload(rng: random.Random, message_id: int, channel_id: int, authors: int = 200) -> dict:
+    author_id = rng.randrange(authors) + 1
+    attachments, embeds = [], []
+    roll = rng.random()
+    if roll < 0.1:
+        attachments = [{"id": str(message_id), "filename": "image.png", "size": 1024,
+                        "url": f"https://cdn.discordapp.com/attachments/{channel_id}/{message_id}/image.png",
+                        "proxy_url": f"https://media.discordapp.net/attachments/{channel_id}/{message_id}/image.png"}]
+    elif roll < 0.2:
+        embeds = [{"type": "gifv", "url": "https://tenor.com/view/x", "thumbnail": {"url": "https://media.tenor.com/x.png"}}]
+    return {
+        "id": str(message_id), "channel_id": str(channel_id), "guild_id": str(GUILD_ID),
+        "author": {"id": str(author_id), "username": f"user{author_id}", "discriminator": "0", "avatar": None},
+        "content": " ".join(rng.choices(WORDS, k=rng.randint(1, 40))),
+        "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+        "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": attachments,
+        "embeds": embeds, "pinned": False, "type": 0, "reactions": random_reactions(rng),
+    }
+
+
+def message_id_at(index: int) -> int:
+    """Id of the index-th message of a synthetic channel, counting from 1; one message per millisecond."""
+    return FIRST_MESSAGE_ID + (index << 22)
+
+
+def payload_at(index: int, channel_id: int, seed: int = 0) -> dict:
+    """The index-th message of a synthetic channel, the same on every call, without generating the ones before it."""
+    return message_payload(random.Random(seed * 1000003 + index), message_id_at(index), channel_id)
+
+
+def generate_messages(state, channel, count: int, seed: int = 0) -> list:
+    """Return `count` discord.Message objects, newest first like channel.history()."""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        message_id = message_id_at(count - i)
+        messages.append(discord.Message(state=state, channel=channel, data=message_payload(rng, message_id, channel.id)))
+    return messages
+
+
+def cached_from_payload(payload: dict) -> CachedMessage:
+    """Build the CachedMessage that CachedMessage.from_message would, without a discord.Message in between."""
+    reactions = []
+    for reaction in payload["reactions"]:
+        emoji = reaction["emoji"]
+        display = emoji["name"] if emoji["id"] is None else f"<:{emoji['name']}:{emoji['id']}>"
+        reactions.append(CachedReaction(EMOJI_TABLE.intern(emoji["name"], display), reaction["count"]))
+    attachments = payload["attachments"]
+    return CachedMessage(
+        id=int(payload["id"]), channel_id=int(payload["channel_id"]), guild_id=int(payload["guild_id"]),
+        author_id=int(payload["author"]["id"]), content=payload["content"],
+        image_url=attachments[0]["url"] if attachments else None, has_attachments=bool(attachments),
+        has_embed_media=bool(payload["embeds"]), reactions=reactions,
+    )
+
+
+def generate_cached_messages(count: int, channel_id: int = 200000000000000000, seed: int = 0) -> list:
+    """Return `count` CachedMessage records, oldest first. Much faster than generate_messages for large counts."""
+    rng = random.Random(seed)
+    return [cached_from_payload(message_payload(rng, message_id_at(i), channel_id)) for i in range(1, count + 1)]
@@ -1,8 +1,80 @@
 import os 
+from dotenv import load_dotenv
+
+# Settings are read from the environment when this module is imported, so .env has to be loaded first
+load_dotenv()
 
 class Config:
     DEBUG = False
 
+    # Maximum number of messages kept per channel
+    MAX_MESSAGES = 5000
+
+    # Maximum number of messages kept per guild; least recently used channels are evicted beyond it
+    GUILD_MAX_MESSAGES = int(os.getenv('GUILD_MAX_MESSAGES', '50000'))
+
+    # Budget for every cached channel together, in messages and in estimated MB (0 disables either).
+    # Over it, channels idle for CACHE_IDLE_MINUTES are evicted first, least recently used first; then the
+    # others are trimmed to their newest CACHE_TRIM_MESSAGES, then evicted. Evicted channels reload from
+    # the persistent store on their next /top.
+    CACHE_MAX_MESSAGES = int(os.getenv('CACHE_MAX_MESSAGES', '200000'))
+    CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', '0'))
+    CACHE_IDLE_MINUTES = float(os.getenv('CACHE_IDLE_MINUTES', '60'))
+    CACHE_TRIM_MESSAGES = int(os.getenv('CACHE_TRIM_MESSAGES', '1000'))
+
+    # SQLite file used to persist the reaction cache across restarts
+    CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', 'reactions.db')
+
+    # JSON file of per-guild scoring rules (negative, neutral and strong positive emojis, weights); empty uses the built-in rules
+    SCORING_RULES_FILE = os.getenv('SCORING_RULES_FILE', '')
+
+    # Minutes between re-reads of cached reaction counts from history (0 disables). Channels loaded back from
+    # CACHE_DB_PATH, at startup or after eviction, keep their stored counts until this re-read or !reconcile
+    RECONCILE_INTERVAL_MINUTES = int(os.getenv('RECONCILE_INTERVAL_MINUTES', '360'))
+
+    # Seconds to wait for more events on a message before refetching or saving it
+    REFRESH_DEBOUNCE_SECONDS = float(os.getenv('REFRESH_DEBOUNCE_SECONDS', '2'))
+
+    # Concurrent message refetches allowed per channel
+    REFRESH_CONCURRENCY_PER_CHANNEL = int(os.getenv('REFRESH_CONCURRENCY_PER_CHANNEL', '2'))
+
+    # While /top fills a cold channel, show the top posts among the messages fetched so far every this many seconds
+    # (0 shows only the message count)
+    TOP_PREVIEW_INTERVAL_SECONDS = float(os.getenv('TOP_PREVIEW_INTERVAL_SECONDS', '1'))
+
+    # Channels crawled at once when /topguild fills uncached channels
+    GUILD_CRAWL_CONCURRENCY = int(os.getenv('GUILD_CRAWL_CONCURRENCY', '3'))
+
+    # Caches of at least this many messages are built, and ranked over the reaction matrix, on a worker thread
+    # so the event loop keeps up with gateway heartbeats and events
+    OFFLOAD_MIN_MESSAGES = int(os.getenv('OFFLOAD_MIN_MESSAGES', '50000'))
+
+    # Background history crawl at startup, most active channels first unless WARMUP_CHANNELS lists them
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'false').lower() == 'true'
+    WARMUP_CHANNELS = [int(c) for c in os.getenv('WARMUP_CHANNELS', '').split(',') if c.strip()]
+    # Maximum history requests (100 messages each) the warm-up may spend
+    WARMUP_REQUEST_BUDGET = int(os.getenv('WARMUP_REQUEST_BUDGET', '500'))
+
+    # Local port serving Prometheus metrics on /metrics (0 disables), and the address it binds to
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+    # Sample the event loop's stack from startup (also toggled with !profile); collapsed stacks are served on /profile
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '10'))
+
+    # How often to measure event loop lag, i.e. how late a timer wakes up (0 disables)
+    LOOP_MONITOR_INTERVAL_MS = float(os.getenv('LOOP_MONITOR_INTERVAL_MS', '100'))
+
+    # Log file, rotated at LOG_MAX_MB with LOG_BACKUP_COUNT old files kept; LOG_FORMAT is 'text' or 'json'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FILE = os.getenv('LOG_FILE', 'discord.log')
+    LOG_MAX_MB = float(os.getenv('LOG_MAX_MB', '5'))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '3'))
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    # Per-event log lines (messages, edits, reactions) written per second for each event type (0 logs them all)
+    LOG_EVENTS_PER_SECOND = int(os.getenv('LOG_EVENTS_PER_SECOND', '5'))
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
@@ -13,4 +85,4 @@ class ProductionConfig(Config):
 if os.getenv('ENV') == 'dev':
     config = DevelopmentConfig()
 else:
-    config = ProductionConfig()
\ No newline at end of file
+    config = ProductionConfig()
@@ -1,28 +1,175 @@
-import pdb
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-import os
+import queue
+import sys
 import pprint
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Define constants
 LOG_FILENAME = 'log.txt'
 MAX_LOG_SIZE_BYTES = 5 * 1024 * 1024  # Set a maximum log size of 5MB
 BACKUP_COUNT = 1  # We'll keep one backup log file (log.txt.1)
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
-# Set up logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[RotatingFileHandler(LOG_FILENAME, maxBytes=MAX_LOG_SIZE_BYTES, backupCount=BACKUP_COUNT)]
-)
+# Attributes every LogRecord has; anything else was passed through extra= and is a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
 
 logger = logging.getLogger()
 
-PRINT_TO_CONSOLE = True
+_listener = None
 
-def _print(message):
-  if PRINT_TO_CONSOLE:
-    print(message)
+
+class EventSampler(logging.Filter):
+    """Lets at most `per_second` records through per second for each event type.
+
+    Only records logged with extra={"event": ...} are sampled. The first record
+    let through after a suppressed stretch carries the number dropped as
+    `suppressed`.
+    """
+
+    def __init__(self, per_second: int):
+        super().__init__()
+        self.per_second = per_second
+        self._windows = {}   # event -> [window start, records passed, records suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+        window = self._windows.get(event)
+        if window is None or record.created - window[0] >= 1:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            window = self._windows[event] = [record.created, 0, 0]
+        if window[1] >= self.per_second:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """Hands records to the writer thread with only the message merged.
+
+    The stdlib prepare() formats and copies every record on the calling thread.
+    The record has been through every other handler by the time it reaches the
+    root's queue handler, so it's changed in place. A traceback is rendered to
+    exc_text, since the writer thread can't rely on the frames still being intact.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _BatchingQueueListener(QueueListener):
+    """Writes everything waiting in the queue, then flushes the console once, instead of flushing it per record."""
+
+    MAX_BATCH = 1000
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = False
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+            for handler in self.handlers:
+                if isinstance(handler, _BatchedStreamHandler):
+                    handler.flush_batch()
+            for _ in batch:
+                q.task_done()
+            if stopping:
+                return
+
+
+class _BatchedStreamHandler(logging.StreamHandler):
+    """Console handler that leaves flushing to _BatchingQueueListener."""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class TextFormatter(logging.Formatter):
+    """The classic one-line format, noting how many similar records the sampler dropped."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", None)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with extra= fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name, "message": record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=logging.INFO, filename=LOG_FILENAME, max_bytes=MAX_LOG_SIZE_BYTES, backup_count=BACKUP_COUNT,
+                  json_format=False, events_per_second=0, stream=sys.stderr) -> QueueListener:
+    """Route the root logger through a queue to a background thread that writes the rotating file and the console.
+
+    Logging calls only merge the message and enqueue it, so no disk or terminal I/O happens on the event loop.
+    events_per_second > 0 samples per-event records (see EventSampler). Call stop_logging() to flush on shutdown.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = JsonFormatter() if json_format else TextFormatter()
+    handlers = [RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')]
+    if stream is not None:
+        handlers.append(_BatchedStreamHandler(stream))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    queue_handler = _QueueHandler(log_queue)
+    if events_per_second > 0:
+        queue_handler.addFilter(EventSampler(events_per_second))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Write out everything still queued and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
 def prettify(message, pretty=False):
     if pretty:
@@ -32,40 +179,20 @@ def prettify(message, pretty=False):
 
 
 def log_info(message, pretty=False):
-    message = prettify(message, pretty)
-    logger.info(message)
-    _print(message)
-    _check_and_trim_log()
+    logger.info(prettify(message, pretty))
 
 def log_error(message, pretty=False):
-    message = prettify(message, pretty)
-    logger.error(message)
-    _print(message)
-    _check_and_trim_log()
+    logger.error(prettify(message, pretty))
 
 def log_warning(message, pretty=False):
-    message = prettify(message, pretty)
-    logger.warning(message)
-    _print(message)
-    _check_and_trim_log()
+    logger.warning(prettify(message, pretty))
 
 def log_debug(message, pretty=False):
-    message = prettify(message, pretty)
-    logger.debug(message)
-    _print(message)
-    _check_and_trim_log()
-
-def _check_and_trim_log():
-    if os.path.exists(LOG_FILENAME) and os.path.getsize(LOG_FILENAME) > MAX_LOG_SIZE_BYTES:
-        with open(LOG_FILENAME, 'r+') as log_file:
-            log_file.seek(-MAX_LOG_SIZE_BYTES, os.SEEK_END)
-            log_file.readline()  # Skip potentially partial line
-            remaining_lines = log_file.readlines()
-            log_file.seek(0)
-            log_file.truncate()
-            log_file.writelines(remaining_lines)
+    logger.debug(prettify(message, pretty))
 
 if __name__ == "__main__":
     # Test the logger
+    setup_logging(level=logging.DEBUG)
     log_info("This is an info message.")
     log_error("This is an error message.")
+    stop_logging()
@@ -1,77 +1,261 @@
 import pdb
 import os
+import asyncio
+import math
+import time
+from collections import Counter
 from typing import Literal, Optional
 import discord
-from dotenv import load_dotenv
 from discord.ext import commands
 import logging
-from slash_commands.admin import sync
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(filename='discord.log', encoding='utf-8', mode='w'),
-                        logging.StreamHandler()
-                    ])
+from slash_commands.admin import sync, reconcile, stats, cachestatus, memory, profile, scoring
+from config import config
+from logger import setup_logging, stop_logging
+from util.cached_message import CachedMessage, EMOJI_TABLE
+from util.channel_cache import ChannelCache
+from util.message_cache import MessageCache
+from util.message_store import MessageStore
+from util.loop_monitor import LoopLagMonitor
+from util.metrics import METRICS, GATEWAY_EVENTS, http_trace_config, start_metrics_server
+from util.profiler import StackSampler
+from util.query_cache import QueryCache
+from util.refresh_scheduler import RefreshScheduler
+from util.scoring_rules import SCORING_RULES
 
 logger = logging.getLogger()
 
-load_dotenv()
-
+# Optional: only used to sync commands to a single guild (see on_ready)
 GUILD_ID = os.getenv('GUILD_ID')
-GUILD = discord.Object(id=GUILD_ID)
+GUILD = discord.Object(id=GUILD_ID) if GUILD_ID else None
 
 intents = discord.Intents.default()
 intents.message_content=True
 intents.emojis_and_stickers=True
 
-class TopReactionsBot(commands.Bot):
+class TopReactionsBot(commands.AutoShardedBot):
     def __init__(self):
         # initialize our bot instance, make sure to pass your intents!
         # for this example, we'll just have everything enabled
         super().__init__(
             command_prefix="!",
-            intents=intents
+            intents=intents,
+            http_trace=http_trace_config(),
         )
 
-        self.channel_messages = {}
+        self.channel_messages = MessageCache(config.GUILD_MAX_MESSAGES)
+        # Channels whose cache has been brought up to date with Discord since startup
+        self.synced_channels = set()
+        # Reaction events applied from the gateway payload instead of a fetch_message call
+        self.rest_calls_saved = 0
+        self.store = MessageStore(config.CACHE_DB_PATH)
+        # Edit refetches and store writes are coalesced per message so bursts cost one call each
+        self.refresher = RefreshScheduler(self.refresh_message, config.REFRESH_DEBOUNCE_SECONDS, config.REFRESH_CONCURRENCY_PER_CHANNEL)
+        self.saver = RefreshScheduler(self.save_message, config.REFRESH_DEBOUNCE_SECONDS, 1)
+        self.query_cache = QueryCache()
+        self.profiler = StackSampler(config.PROFILING_INTERVAL_MS / 1000)
+        self.metrics_runner = None
+        self.loop_monitor = LoopLagMonitor(config.LOOP_MONITOR_INTERVAL_MS / 1000)
+        self.register_metrics()
+
+    def register_metrics(self):
+        """Expose cache sizes and queue depths, read at scrape time."""
+        METRICS.callback("topreactions_cached_channels", "Channels in the in-memory cache.", lambda: len(self.channel_messages.channels()))
+        METRICS.callback("topreactions_cached_messages", "Messages in the in-memory cache.", self.channel_messages.message_count)
+        METRICS.callback("topreactions_cache_estimated_bytes", "Estimated memory of the in-memory cache.", self.channel_messages.estimated_bytes)
+        METRICS.callback("topreactions_synced_channels", "Channels brought up to date with Discord since startup.", lambda: len(self.synced_channels))
+        METRICS.callback("topreactions_refetch_queue_depth", "Edited messages waiting to be refetched.", lambda: self.refresher.queue_depth)
+        METRICS.callback("topreactions_store_write_queue_depth", "Messages waiting to be written to the store.", lambda: self.saver.queue_depth)
+        METRICS.callback("topreactions_query_cache_hits_total", "/top rankings answered from the query cache.", lambda: self.query_cache.hits, "counter")
+        METRICS.callback("topreactions_query_cache_misses_total", "/top rankings computed.", lambda: self.query_cache.misses, "counter")
+        METRICS.callback("topreactions_gateway_heartbeat_latency_seconds", "Time between the last gateway heartbeat and its acknowledgement.",
+                         lambda: self.latency if math.isfinite(self.latency) else 0.0)
+        METRICS.callback("topreactions_reaction_events_applied_total", "Reaction events applied without a REST call.", lambda: self.rest_calls_saved, "counter")
 
     async def setup_hook(self):
+        # Before the stored messages, so their scored leaderboards are built with the configured rules
+        if config.SCORING_RULES_FILE:
+            SCORING_RULES.load(config.SCORING_RULES_FILE)
+        await self.load_stored_channels()
+
         await self.load_extension("slash_commands.fetch_reactions")
+        await self.load_extension("slash_commands.emoji_stats")
+
+        if config.PROFILING_ENABLED:
+            self.profiler.start()
+        if config.LOOP_MONITOR_INTERVAL_MS:
+            self.loop_monitor.start()
+        if config.METRICS_PORT:
+            self.metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT, self.profiler)
+            logger.info(f"Serving metrics on http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
 
         logger.info("Loaded extensions and cogs.")
 
-    async def get_all_channels(self):
-        """Return all text channels in the guild."""
-        channels = []
-        guild = self.get_guild(int(GUILD_ID))
+    async def load_stored_channels(self):
+        """Rebuild the caches of stored channels, most recently used first, while they fit their guild's cap and the memory budget.
+
+        The rest stay in the store until their next crawl. Loaded channels catch up with history on theirs.
+        """
+        max_bytes = int(config.CACHE_MAX_MB * 1024 * 1024)
+        loaded = []   # (guild id, channel id, ChannelCache), most recently used first
+        messages = size = 0
+        guild_messages = Counter()
+        channels = await asyncio.to_thread(self.store.channels_by_use)
+        for channel_id, guild_id, count in channels:
+            count = min(count, config.MAX_MESSAGES)
+            if guild_messages[guild_id] + count > config.GUILD_MAX_MESSAGES:
+                continue
+            if config.CACHE_MAX_MESSAGES and messages + count > config.CACHE_MAX_MESSAGES:
+                break
+            stored = await asyncio.to_thread(self.store.load_channel, channel_id, config.MAX_MESSAGES)
+            cache = await self.build_cache(stored)
+            if max_bytes and size + cache.estimated_bytes() > max_bytes:
+                break
+            loaded.append((guild_id, channel_id, cache))
+            messages += len(cache)
+            size += cache.estimated_bytes() if max_bytes else 0
+            guild_messages[guild_id] += len(cache)
+        # Least recently used first, so the cache's LRU order picks up where the last run left off
+        for guild_id, channel_id, cache in reversed(loaded):
+            self.channel_messages.put(guild_id, channel_id, cache)
+        logger.info(f"Loaded {messages} stored messages across {len(loaded)} channels from {self.store.path}; "
+                    f"{len(channels) - len(loaded)} channels stay in the store until they're used")
 
-        for channel in guild.channels:
-            if isinstance(channel, discord.TextChannel):
-                channels.append(channel)
-        logger.info(f"Retrieved {len(channels)} text channels across all guilds.")
+    async def record_use(self, channel_ids: list):
+        """Remember in the store that commands used these channels, for load_stored_channels after a restart."""
+        await asyncio.to_thread(self.store.mark_used, list(channel_ids), time.time())
+
+    async def close(self):
+        await super().close()
+        await self.saver.drain()
+        self.store.close()
+        self.profiler.stop()
+        await self.loop_monitor.stop()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        stop_logging()
+
+    async def get_all_channels(self, guild: discord.Guild):
+        """Return all text channels in a guild."""
+        channels = [channel for channel in guild.channels if isinstance(channel, discord.TextChannel)]
+        logger.info(f"Retrieved {len(channels)} text channels in {guild.name}.")
         return channels
 
+    async def build_cache(self, messages: list) -> ChannelCache:
+        """Index messages into a new ChannelCache, on a worker thread when there are OFFLOAD_MIN_MESSAGES or more.
+
+        The cache isn't shared until it's returned, so nothing else touches it while it's built.
+        """
+        if len(messages) >= config.OFFLOAD_MIN_MESSAGES:
+            return await asyncio.to_thread(ChannelCache, config.MAX_MESSAGES, messages)
+        return ChannelCache(config.MAX_MESSAGES, messages)
+
+    def enforce_guild_cap(self, guild_id: int, keep: set = frozenset()):
+        """Evict the least recently used channels of a guild over GUILD_MAX_MESSAGES; they're fetched again on their next /top."""
+        for channel_id in self.channel_messages.over_guild_cap(guild_id, keep):
+            self.evict_channel(channel_id)
+
+    def enforce_memory_budget(self, keep: set = frozenset()):
+        """Trim and evict the least recently used channels until the whole cache fits CACHE_MAX_MESSAGES and CACHE_MAX_MB."""
+        evicted = self.channel_messages.enforce_budget(
+            config.CACHE_MAX_MESSAGES, int(config.CACHE_MAX_MB * 1024 * 1024),
+            config.CACHE_IDLE_MINUTES * 60, config.CACHE_TRIM_MESSAGES, keep,
+        )
+        for channel_id in evicted:
+            self.evict_channel(channel_id)
+
+    def reload_scoring_rules(self):
+        """Re-read SCORING_RULES_FILE and rescore every cached channel under the new rules."""
+        SCORING_RULES.load(config.SCORING_RULES_FILE)
+        for cache in self.channel_messages.channels().values():
+            cache.rescore()
+
+    def evict_channel(self, channel_id: int):
+        self.channel_messages.discard(channel_id)
+        self.synced_channels.discard(channel_id)
+        self.query_cache.discard(channel_id)
+        logger.info(f"Evicted channel {channel_id} from the message cache")
+
     async def update_cache(self, message: discord.Message):
-        """Update the message cache when a message is created, edited, or deleted."""
+        """Add a newly created message to the cache straight from the gateway."""
         if self.channel_messages.get(message.channel.id) is not None:
-            logger.info(f"Message event in {message.channel.name} (ID: {message.channel.id})")
-            await self.fetch_and_update_cache(message.channel, message.id)
+            logger.info(f"Message event in {message.channel.name} (ID: {message.channel.id})",
+                        extra={"event": "message_cache", "channel_id": message.channel.id})
+            if self.cache_message(message.channel, message) and self.can_store(message.channel.id, message.id):
+                self.saver.schedule(message.channel.id, message.id)
 
     async def update_cache_raw_message(self, payload: discord.RawMessageUpdateEvent):
-        """Update the message cache when a message is edited."""
+        """Queue a refetch of an edited message; bursts of edits to one message share a single fetch."""
         channel = self.get_channel(payload.channel_id)
         if channel and self.channel_messages.get(channel.id) is not None:
-            logger.info(f"Message edit event in {channel.name} (ID: {channel.id})")
-            await self.fetch_and_update_cache(channel, payload.message_id)
+            logger.info(f"Message edit event in {channel.name} (ID: {channel.id})",
+                        extra={"event": "message_edit_cache", "channel_id": channel.id})
+            self.refresher.schedule(channel.id, payload.message_id)
+
+    async def delete_cached_messages(self, channel_id: int, message_ids):
+        """Drop deleted messages from their channel's cache and from the store, which outlives evictions and restarts."""
+        cache = self.channel_messages.get(channel_id)
+        if cache is not None:
+            for message_id in message_ids:
+                cache.remove(message_id)
+        await asyncio.to_thread(self.store.delete_messages, list(message_ids))
+
+    async def refresh_message(self, channel_id: int, message_id: int):
+        channel = self.get_channel(channel_id)
+        if channel is not None:
+            await self.fetch_and_update_cache(channel, message_id)
+
+    def can_store(self, channel_id: int, message_id: int) -> bool:
+        """Whether a cached message can be written to the store without leaving a gap below it there.
+
+        Until a channel has caught up, messages past synced_through may be newer than history that isn't
+        fetched yet, and the next startup catches up from the newest stored message. The catch-up crawl
+        saves them instead.
+        """
+        if channel_id in self.synced_channels:
+            return True
+        cache = self.channel_messages.get(channel_id)
+        return cache is not None and cache.synced_through is not None and message_id <= cache.synced_through
+
+    async def save_message(self, channel_id: int, message_id: int):
+        message = self.get_cached_message(channel_id, message_id)
+        if message is not None and self.can_store(channel_id, message_id):
+            await asyncio.to_thread(self.store.save_messages, [message])
+
+    def get_cached_message(self, channel_id: int, message_id: int) -> CachedMessage:
+        cache = self.channel_messages.get(channel_id)
+        return cache.get(message_id) if cache is not None else None
+
+    def intern_payload_emoji(self, emoji: discord.PartialEmoji):
+        """Intern a gateway emoji, resolving custom emojis the bot can see so they render like history ones."""
+        if emoji.id is not None:
+            emoji = self.get_emoji(emoji.id) or emoji
+        return EMOJI_TABLE.intern_emoji(emoji)
 
     async def update_cache_reaction(self, payload: discord.RawReactionActionEvent):
-        """Update the message cache when a reaction is added or removed."""
-        channel = self.get_channel(payload.channel_id)
-        if channel and self.channel_messages.get(channel.id) is not None:
-            logger.info(f"Reaction event in {channel.name} (ID: {channel.id})")
-            await self.fetch_and_update_cache(channel, payload.message_id)
+        """Apply a reaction add or remove from the gateway payload to the cached message."""
+        message = self.get_cached_message(payload.channel_id, payload.message_id)
+        if message is None:
+            return
+
+        delta = 1 if payload.event_type == "REACTION_ADD" else -1
+        message.apply_reaction(self.intern_payload_emoji(payload.emoji), delta)
+        self.channel_messages[payload.channel_id].reindex(message)
+        self.rest_calls_saved += 1
+        self.saver.schedule(payload.channel_id, payload.message_id)
+
+    async def clear_cache_reactions(self, payload):
+        """Drop all reactions, or one emoji's reactions, from the cached message."""
+        message = self.get_cached_message(payload.channel_id, payload.message_id)
+        if message is None:
+            return
+
+        if isinstance(payload, discord.RawReactionClearEmojiEvent):
+            message.clear_reaction(self.intern_payload_emoji(payload.emoji))
+        else:
+            message.reactions = ()
+        self.channel_messages[payload.channel_id].reindex(message)
+        self.rest_calls_saved += 1
+        self.saver.schedule(payload.channel_id, payload.message_id)
 
     async def fetch_and_update_cache(self, channel, message_id):
         """Fetches a message by ID and updates or adds it to the cache."""
@@ -87,26 +271,43 @@ class TopReactionsBot(commands.Bot):
             logger.error(f"Failed to fetch message {message_id} in {channel.name} (ID: {channel.id}): {str(e)}")
             return None
 
-        messages = self.channel_messages.get(channel.id, [])
-        existing_message_index = next((i for i, msg in enumerate(messages) if msg.id == message.id), None)
+        message = self.cache_message(channel, message)
+        if message is not None and self.can_store(channel.id, message.id):
+            await asyncio.to_thread(self.store.save_messages, [message])
+        return message
 
-        if existing_message_index is not None:
-            messages[existing_message_index] = message
-            logger.info(f"Updated message {message.id} in cache for {channel.name} (ID: {channel.id})")
-        else:
-            messages.append(message)
-            logger.info(f"Added message {message.id} to cache for {channel.name} (ID: {channel.id})")
+    def cache_message(self, channel, message: discord.Message) -> CachedMessage:
+        """Add or replace a message in its channel's cache, returning the cached record."""
+        cache = self.channel_messages.get(channel.id)
+        if cache is None:
+            return None
+
+        message = CachedMessage.from_message(message)
+        existing = message.id in cache
 
-        self.channel_messages[channel.id] = messages
+        if not cache.admits(message.id) or not cache.add(message):
+            logger.info(f"Ignored message {message.id} older than the cached window for {channel.name} (ID: {channel.id})",
+                        extra={"event": "message_ignored", "channel_id": channel.id, "message_id": message.id})
+            return None
+        if existing:
+            logger.info(f"Updated message {message.id} in cache for {channel.name} (ID: {channel.id})",
+                        extra={"event": "message_updated", "channel_id": channel.id, "message_id": message.id})
+        else:
+            logger.info(f"Added message {message.id} to cache for {channel.name} (ID: {channel.id})",
+                        extra={"event": "message_added", "channel_id": channel.id, "message_id": message.id})
         return message
 
+    async def on_socket_event_type(self, event_type: str):
+        GATEWAY_EVENTS.inc(event=event_type)
+
     # Also update the cache when a new message is created
     async def on_message(self, message: discord.Message):
         # Ignore messages from the bot
         if message.author == self.user:
             return
         
-        logger.info(f"New message {message.id} in channel {message.channel.id}")
+        logger.info(f"New message {message.id} in channel {message.channel.id}",
+                    extra={"event": "message_create", "channel_id": message.channel.id, "message_id": message.id})
         await self.update_cache(message)
         await self.process_commands(message)
         
@@ -115,17 +316,40 @@ class TopReactionsBot(commands.Bot):
             if payload.cached_message.author == self.user:
                 return
             
-        logger.info(f"Message edit event in {payload.channel_id}")
+        logger.info(f"Message edit event in {payload.channel_id}",
+                    extra={"event": "message_edit", "channel_id": payload.channel_id, "message_id": payload.message_id})
         await self.update_cache_raw_message(payload)
 
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        logger.info(f"Message delete event in {payload.channel_id}",
+                    extra={"event": "message_delete", "channel_id": payload.channel_id, "message_id": payload.message_id})
+        await self.delete_cached_messages(payload.channel_id, [payload.message_id])
+
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        logger.info(f"Bulk delete of {len(payload.message_ids)} messages in {payload.channel_id}",
+                    extra={"event": "message_bulk_delete", "channel_id": payload.channel_id})
+        await self.delete_cached_messages(payload.channel_id, payload.message_ids)
+
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        logger.info(f"Reaction add event in {payload.channel_id}")
+        logger.info(f"Reaction add event in {payload.channel_id}",
+                    extra={"event": "reaction_add", "channel_id": payload.channel_id, "message_id": payload.message_id})
         await self.update_cache_reaction(payload)
 
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        logger.info(f"Reaction remove event in {payload.channel_id}")
+        logger.info(f"Reaction remove event in {payload.channel_id}",
+                    extra={"event": "reaction_remove", "channel_id": payload.channel_id, "message_id": payload.message_id})
         await self.update_cache_reaction(payload)
 
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        logger.info(f"Reaction clear event in {payload.channel_id}",
+                    extra={"event": "reaction_clear", "channel_id": payload.channel_id, "message_id": payload.message_id})
+        await self.clear_cache_reactions(payload)
+
+    async def on_raw_reaction_clear_emoji(self, payload: discord.RawReactionClearEmojiEvent):
+        logger.info(f"Reaction clear emoji event in {payload.channel_id}",
+                    extra={"event": "reaction_clear_emoji", "channel_id": payload.channel_id, "message_id": payload.message_id})
+        await self.clear_cache_reactions(payload)
+
     async def on_ready(self):
         # Don't sync commands every time the bot restarts
         # Uncomment this block (once) to sync commands then comment it out again
@@ -138,7 +362,26 @@ class TopReactionsBot(commands.Bot):
         print("------")
         logger.info("Bot is ready and waiting for commands.")
 
-bot = TopReactionsBot()
-bot.add_command(sync)
+# Guarded so the offline benchmarks can import TopReactionsBot without starting it
+if __name__ == "__main__":
+    # Configure logging: records are queued and written to the rotating file and console by a background thread
+    setup_logging(
+        level=config.LOG_LEVEL,
+        filename=config.LOG_FILE,
+        max_bytes=int(config.LOG_MAX_MB * 1024 * 1024),
+        backup_count=config.LOG_BACKUP_COUNT,
+        json_format=config.LOG_FORMAT == 'json',
+        events_per_second=config.LOG_EVENTS_PER_SECOND,
+    )
+
+    bot = TopReactionsBot()
+    bot.add_command(sync)
+    bot.add_command(reconcile)
+    bot.add_command(stats)
+    bot.add_command(cachestatus)
+    bot.add_command(memory)
+    bot.add_command(profile)
+    bot.add_command(scoring)
 
-bot.run(os.getenv('DISCORD_TOKEN'))
+    # Logging is already set up above; don't let discord.py add its own synchronous handler
+    bot.run(os.getenv('DISCORD_TOKEN'), log_handler=None)
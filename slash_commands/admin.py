@@ -1,6 +1,8 @@
 from typing import Literal, Optional
 import discord
 from discord.ext import commands
+from config import config
+from util.scoring_rules import SCORING_RULES
 
 @commands.command()
 @commands.guild_only()
@@ -33,4 +35,115 @@ async def sync(ctx: commands.Context, guilds: commands.Greedy[discord.Object], s
         else:
             ret += 1
 
-    await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
\ No newline at end of file
+    await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def reconcile(ctx: commands.Context) -> None:
+    """Re-read this channel's cached reaction counts from Discord."""
+    cog = ctx.bot.get_cog("FetchReactionsCog")
+    count = await cog.reconcile_channel(ctx.channel)
+    await ctx.send(
+        f"Reconciled {count} cached messages. "
+        f"{ctx.bot.rest_calls_saved} reaction events applied without a REST call since startup."
+    )
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def stats(ctx: commands.Context) -> None:
+    """Show cache and event-processing counters."""
+    bot = ctx.bot
+    await ctx.send(
+        f"Reaction events applied without a REST call: {bot.rest_calls_saved}\n"
+        f"Edit refetch queue: {bot.refresher.stats()}\n"
+        f"Store write queue: {bot.saver.stats()}\n"
+        f"Query cache: {bot.query_cache.stats()}\n"
+        f"Event loop lag: {bot.loop_monitor.stats()}; heartbeat latency {bot.latency * 1000:.0f} ms"
+    )
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def cachestatus(ctx: commands.Context) -> None:
+    """List which channels are warm (cached and up to date), stored (loaded from disk) or cold."""
+    bot = ctx.bot
+    warm, stored, cold = [], [], []
+    for channel in await bot.get_all_channels(ctx.guild):
+        if channel.id in bot.synced_channels:
+            warm.append(channel.mention)
+        elif bot.channel_messages.get(channel.id):
+            stored.append(channel.mention)
+        else:
+            cold.append(channel.mention)
+
+    cog = bot.get_cog("FetchReactionsCog")
+    lines = [
+        f"Warm-up: {cog.warmup_status}",
+        f"Cached messages in this guild: {bot.channel_messages.message_count(ctx.guild.id)}/{bot.channel_messages.guild_max_messages}",
+    ]
+    for label, mentions in (("Warm", warm), ("Stored", stored), ("Cold", cold)):
+        lines.append(f"{label} ({len(mentions)}): {' '.join(mentions) or '-'}")
+    await ctx.send("\n".join(lines)[:2000])
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def memory(ctx: commands.Context) -> None:
+    """Report the estimated memory of every cached channel, largest first, against the cache budget."""
+    bot = ctx.bot
+    caches = bot.channel_messages.channels()
+    sizes = {channel_id: cache.estimated_bytes() for channel_id, cache in caches.items()}
+    budget_mb = f"{config.CACHE_MAX_MB:.0f} MB" if config.CACHE_MAX_MB else "no MB limit"
+    budget_messages = config.CACHE_MAX_MESSAGES or "no message limit"
+    lines = [
+        f"Cached: {sum(len(cache) for cache in caches.values())} messages in {len(caches)} channels, "
+        f"~{sum(sizes.values()) / 2**20:.1f} MB (budget: {budget_messages} messages, {budget_mb})",
+    ]
+    for channel_id in sorted(sizes, key=sizes.get, reverse=True):
+        channel = bot.get_channel(channel_id)
+        name = channel.mention if channel else str(channel_id)
+        idle = bot.channel_messages.idle_seconds(channel_id) / 60
+        lines.append(f"{name}: {len(caches[channel_id])} messages, ~{sizes[channel_id] / 2**20:.2f} MB, idle {idle:.0f} min")
+    await ctx.send("\n".join(lines)[:2000])
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def profile(ctx: commands.Context, action: Optional[Literal["on", "off"]] = None) -> None:
+    """Start or stop sampling the event loop's stack; stopping reports the hottest functions."""
+    profiler = ctx.bot.profiler
+    if action == "on":
+        profiler.reset()
+        profiler.start()
+        await ctx.send(f"Profiling every {profiler.interval * 1000:.0f} ms. Stop with `!profile off`.")
+        return
+    if action == "off":
+        profiler.stop()
+
+    lines = [f"Profiler {'running' if profiler.running else 'stopped'}, {profiler.samples} samples"]
+    lines += [f"{share:.1%} {function}" for function, share in profiler.hottest()]
+    await ctx.send("\n".join(lines)[:2000])
+
+
+@commands.command()
+@commands.guild_only()
+@commands.is_owner()
+async def scoring(ctx: commands.Context, action: Optional[Literal["reload"]] = None) -> None:
+    """Show this guild's scoring rules; `reload` re-reads SCORING_RULES_FILE and rescores every cached channel."""
+    if action == "reload":
+        if not config.SCORING_RULES_FILE:
+            await ctx.send("SCORING_RULES_FILE is not set.")
+            return
+        try:
+            ctx.bot.reload_scoring_rules()
+        except (OSError, ValueError) as e:
+            await ctx.send(f"Could not load {config.SCORING_RULES_FILE}: {e}")
+            return
+    await ctx.send(SCORING_RULES.for_guild(ctx.guild.id).describe()[:2000])
@@ -0,0 +1,96 @@
+import time
+from typing import Literal
+import discord
+from discord import app_commands
+from discord.ext import commands
+from util.embed_utils import EmbedUtils
+from util.metrics import COMMAND_STAGE_SECONDS
+import logging
+
+logger = logging.getLogger()
+
+MAX_SHOW = 25
+
+class EmojiStatsCog(commands.Cog):
+    """Emoji and author statistics, answered from the reaction tallies the caches keep up to date."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def get_tally(self, interaction: discord.Interaction, scope: str):
+        """Return the tally for the scope and a note on what it covers, crawling the channel first if needed."""
+        if scope == "guild":
+            cached = sum(1 for channel in interaction.guild.text_channels if self.bot.channel_messages.get(channel.id))
+            return self.bot.channel_messages.tally(interaction.guild.id), f"Across the {cached} cached channels of this server"
+
+        channel = interaction.channel
+        fetcher = self.bot.get_cog("FetchReactionsCog")
+        if fetcher.needs_fetch(channel):
+            async with fetcher.user_crawl([channel.id]):
+                await fetcher.fetch_messages(channel)
+        cache = self.bot.channel_messages.get(channel.id)
+        if cache is None:
+            return None, None
+        return cache.tally, f"In the last {len(cache)} messages of {channel.mention}"
+
+    @staticmethod
+    def emoji_label(emoji) -> str:
+        return emoji.display or f":{emoji.name}:"
+
+    @staticmethod
+    def format_lines(rows: list) -> str:
+        return "\n".join(f"**{rank}.** {label} — {count} reactions" for rank, (label, count) in enumerate(rows, start=1))
+
+    async def send_stats(self, interaction: discord.Interaction, command: str, title: str, note: str, rows: list, start: float):
+        description = f"{title}\n{note}\n\n{EmojiStatsCog.format_lines(rows) or 'No reactions yet.'}"
+        await interaction.followup.send(embed=EmbedUtils.create_embed(description), ephemeral=True)
+        COMMAND_STAGE_SECONDS.observe(time.perf_counter() - start, command=command, stage="total")
+
+    @app_commands.command(name="topemojis")
+    @app_commands.guild_only()
+    @app_commands.describe(scope="Count this channel or every cached channel of the server.", show="The number of emojis to display.")
+    async def top_emojis(self, interaction: discord.Interaction, scope: Literal["channel", "guild"] = "channel", show: app_commands.Range[int, 1, MAX_SHOW] = 10):
+        """Show the most used reaction emojis."""
+        logger.info(f"Fetching top {show} emojis by {scope} in {interaction.channel.name}")
+        start = time.perf_counter()
+        await interaction.response.defer(ephemeral=True)
+        tally, note = await self.get_tally(interaction, scope)
+        if tally is None:
+            await interaction.followup.send("Unable to fetch messages for this channel.", ephemeral=True)
+            return
+        rows = [(EmojiStatsCog.emoji_label(emoji), count) for emoji, count in tally.top_emojis(show)]
+        await self.send_stats(interaction, "topemojis", "**Most used reactions**", note, rows, start)
+
+    @app_commands.command(name="topauthors")
+    @app_commands.guild_only()
+    @app_commands.describe(scope="Count this channel or every cached channel of the server.", show="The number of authors to display.")
+    async def top_authors(self, interaction: discord.Interaction, scope: Literal["channel", "guild"] = "channel", show: app_commands.Range[int, 1, MAX_SHOW] = 10):
+        """Show the authors whose messages received the most reactions."""
+        logger.info(f"Fetching top {show} authors by {scope} in {interaction.channel.name}")
+        start = time.perf_counter()
+        await interaction.response.defer(ephemeral=True)
+        tally, note = await self.get_tally(interaction, scope)
+        if tally is None:
+            await interaction.followup.send("Unable to fetch messages for this channel.", ephemeral=True)
+            return
+        rows = [(f"<@{author_id}>", count) for author_id, count in tally.top_authors(show)]
+        await self.send_stats(interaction, "topauthors", "**Most reacted-to authors**", note, rows, start)
+
+    @app_commands.command(name="useremojis")
+    @app_commands.guild_only()
+    @app_commands.describe(user="Whose messages to look at.", scope="Count this channel or every cached channel of the server.",
+                           show="The number of emojis to display.")
+    async def user_emojis(self, interaction: discord.Interaction, user: discord.Member, scope: Literal["channel", "guild"] = "channel", show: app_commands.Range[int, 1, MAX_SHOW] = 10):
+        """Show the reactions a user's messages receive most."""
+        logger.info(f"Fetching top {show} emojis for {user.id} by {scope} in {interaction.channel.name}")
+        start = time.perf_counter()
+        await interaction.response.defer(ephemeral=True)
+        tally, note = await self.get_tally(interaction, scope)
+        if tally is None:
+            await interaction.followup.send("Unable to fetch messages for this channel.", ephemeral=True)
+            return
+        rows = [(EmojiStatsCog.emoji_label(emoji), count) for emoji, count in tally.author_top_emojis(user.id, show)]
+        await self.send_stats(interaction, "useremojis", f"**Reactions on {user.mention}'s messages**", note, rows, start)
+
+async def setup(bot):
+    await bot.add_cog(EmojiStatsCog(bot=bot))
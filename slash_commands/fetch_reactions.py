@@ -1,20 +1,136 @@
+import asyncio
+import contextlib
+import heapq
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 import discord
+import numpy as np
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
+from config import config
+from util.cached_message import CachedMessage, EMOJI_TABLE
+from util.channel_cache import ChannelCache
 from util.embed_utils import EmbedUtils
+from util.metrics import COMMAND_STAGE_SECONDS, FETCH_STAGE_SECONDS
+from util.reaction_matrix import ReactionMatrix, emoji_weights, name_mask
 from util.reaction_processor import ReactionProcessor
+from util.scoring_rules import SCORING_RULES, ScoringRules
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
-MAX_MESSAGES = 5000
+MAX_MESSAGES = config.MAX_MESSAGES
 MAX_EMBEDS_PER_MESSAGE = 10
 MAX_EMBED_DESCRIPTION_LENGTH = 6000
+PROGRESS_EDIT_INTERVAL_SECONDS = 2
+NO_MATCHES = "No posts match these options."
+PERIODS = {"day": timedelta(days=1), "week": timedelta(weeks=1), "month": timedelta(days=30), "year": timedelta(days=365)}
+
+class WarmupBudgetSpent(Exception):
+    """Raised by a background crawl that stops mid-channel because WARMUP_REQUEST_BUDGET is spent."""
 
 class FetchReactionsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # One history crawl per channel at a time, however many commands ask for it
+        self.fetch_locks = {}
+        # Channels that user commands are waiting on; background crawls pause for anything else
+        self.user_channels = Counter()
+        self.user_channels_changed = asyncio.Condition()
+        self.history_requests = 0
+        self.warmup_requests = 0
+        self.warmup_status = "disabled"
+        self.warmup_task = None
+
+    async def cog_load(self):
+        self.memory_loop.start()
+        if config.RECONCILE_INTERVAL_MINUTES > 0:
+            self.reconcile_loop.change_interval(minutes=config.RECONCILE_INTERVAL_MINUTES)
+            self.reconcile_loop.start()
+        if config.WARMUP_ENABLED:
+            self.warmup_status = "waiting for gateway"
+            self.warmup_task = asyncio.create_task(self.warm_up())
+
+    async def cog_unload(self):
+        self.reconcile_loop.cancel()
+        self.memory_loop.cancel()
+        if self.warmup_task:
+            self.warmup_task.cancel()
+
+    async def warm_up(self):
+        """Crawl channels in the background, most active first, until the request budget is spent."""
+        await self.bot.wait_until_ready()
+        channels = [channel for guild in self.bot.guilds for channel in await self.bot.get_all_channels(guild)
+                    if FetchReactionsCog.can_read_history(channel)]
+        if config.WARMUP_CHANNELS:
+            by_id = {channel.id: channel for channel in channels}
+            channels = [by_id[channel_id] for channel_id in config.WARMUP_CHANNELS if channel_id in by_id]
+        else:
+            channels.sort(key=lambda channel: channel.last_message_id or 0, reverse=True)
+
+        for position, channel in enumerate(channels, 1):
+            if self.warmup_budget_spent():
+                self.warmup_status = f"stopped: request budget of {config.WARMUP_REQUEST_BUDGET} spent after {position - 1}/{len(channels)} channels"
+                logger.info(f"Warm-up {self.warmup_status}")
+                return
+            if channel.id in self.bot.synced_channels:
+                continue
+            self.warmup_status = f"crawling {channel.name} ({position}/{len(channels)})"
+            await self.fetch_messages(channel, background=True)
+            if self.warmup_budget_spent():
+                self.warmup_status = f"stopped: request budget of {config.WARMUP_REQUEST_BUDGET} spent after {position}/{len(channels)} channels"
+                logger.info(f"Warm-up {self.warmup_status}")
+                return
+
+        self.warmup_status = f"done: {len(channels)} channels, {self.warmup_requests} requests"
+        logger.info(f"Warm-up {self.warmup_status}")
+
+    def warmup_budget_spent(self) -> bool:
+        return self.warmup_requests >= config.WARMUP_REQUEST_BUDGET
+
+    @contextlib.asynccontextmanager
+    async def user_crawl(self, channel_ids: list):
+        """Mark channels as wanted by a user command so background crawls step aside for them."""
+        async with self.user_channels_changed:
+            self.user_channels.update(channel_ids)
+            self.user_channels_changed.notify_all()
+        try:
+            yield
+        finally:
+            async with self.user_channels_changed:
+                self.user_channels.subtract(channel_ids)
+                self.user_channels += Counter()  # Drop ids nobody is waiting on anymore
+                self.user_channels_changed.notify_all()
+
+    async def yield_to_users(self, channel):
+        """Block a background crawl while user commands are waiting on other channels."""
+        async with self.user_channels_changed:
+            await self.user_channels_changed.wait_for(lambda: not self.user_channels or channel.id in self.user_channels)
+
+    @tasks.loop(minutes=360)
+    async def reconcile_loop(self):
+        """Periodically re-read reaction counts so events missed while disconnected get corrected."""
+        for channel_id in list(self.bot.synced_channels):
+            channel = self.bot.get_channel(channel_id)
+            if channel is not None:
+                await self.reconcile_channel(channel)
+        logger.info(f"Reconciled {len(self.bot.synced_channels)} channels; {self.bot.rest_calls_saved} reaction events applied without a REST call so far")
+
+    @reconcile_loop.before_loop
+    async def before_reconcile_loop(self):
+        await self.bot.wait_until_ready()
+        # The first iteration would otherwise run immediately, right after the startup catch-up
+        await asyncio.sleep(config.RECONCILE_INTERVAL_MINUTES * 60)
+
+    @tasks.loop(minutes=1)
+    async def memory_loop(self):
+        """Keep each guild under GUILD_MAX_MESSAGES and the whole cache within its memory budget as live messages grow them between crawls."""
+        keep = self.busy_channels()
+        for guild_id in self.bot.channel_messages.guild_ids():
+            self.bot.enforce_guild_cap(guild_id, keep=keep)
+        self.bot.enforce_memory_budget(keep=keep)
 
     @staticmethod
     def summarize_messages(messages: list) -> str:
@@ -32,35 +148,382 @@ class FetchReactionsCog(commands.Cog):
 
         return summary_str
 
-    async def fetch_messages(self, channel, interaction=None, initial_message=None):
-        """Fetch messages for a given channel and store them with progress logging and optional interaction updates."""
-        if channel.id not in self.bot.channel_messages or self.bot.channel_messages[channel.id] is None:
-            self.bot.channel_messages[channel.id] = []
-            message_count = 0
-            total_messages_fetched = 0
+    async def fetch_messages(self, channel, background=False, since_id: int = 0):
+        """Fetch messages newer than the cached ones for a channel, plus any older ones back to since_id, and store them with progress logging.
+
+        Messages land in the channel's cache as they arrive, so stream_preview can show the leaders so far.
+        """
+        async with self.fetch_locks.setdefault(channel.id, asyncio.Lock()):
+            return await self._fetch_messages(channel, background, since_id)
+
+    async def _fetch_messages(self, channel, background=False, since_id: int = 0):
+        cache = self.bot.channel_messages.get(channel.id)
+        if cache is not None and channel.id in self.bot.synced_channels and cache.covers(since_id):
+            return len(cache)
+
+        if cache is None:
+            # Channels evicted under the memory budget come back from the persistent store and catch up from there.
+            # Register the cache before crawling so live events during the crawl land in it
+            with FETCH_STAGE_SECONDS.time(stage="store_load"):
+                stored = await asyncio.to_thread(self.bot.store.load_channel, channel.id, MAX_MESSAGES)
+                cache = await self.bot.build_cache(stored)
+            self.bot.channel_messages.put(channel.guild.id, channel.id, cache)
+        # Also true for a channel whose first crawl was cut short: it holds only the newest part of its history
+        cold = cache.synced_through is None
+
+        fetched = []
+        # history()'s after= is exclusive
+        after_since = since_id - 1 if since_id else 0
+        try:
+            if channel.id not in self.bot.synced_channels:
+                # Messages loaded from the persistent store only need the history posted since the newest of them,
+                # and a cold channel only needs the requested window. Live messages cached since the store load
+                # can be newer than history nobody fetched yet, so the catch-up starts from synced_through
+                after = after_since if cold else cache.synced_through
+                with FETCH_STAGE_SECONDS.time(stage="crawl"):
+                    fetched += await self._crawl(channel, cache, MAX_MESSAGES, after, None, fetched, background)
+                if cold:
+                    cache.covered_since = since_id if len(fetched) < MAX_MESSAGES else cache.oldest_id
+
+            if not cache.covers(since_id):
+                # Backfill older history down to since_id, from the store as far as it still has it (e.g. after a trim).
+                # Both backfills continue from covered_since: anything cached below it may sit past a gap
+                with FETCH_STAGE_SECONDS.time(stage="store_backfill"):
+                    stored = await asyncio.to_thread(self.bot.store.load_channel, channel.id, MAX_MESSAGES - len(cache), cache.covered_since)
+                    for message in stored:
+                        if message.id >= since_id:
+                            cache.add(message)
+                if stored:
+                    cache.covered_since = since_id if stored[-1].id < since_id else stored[-1].id
+
+            if not cache.covers(since_id):
+                # ...and from history for the rest
+                limit = MAX_MESSAGES - len(cache)
+                with FETCH_STAGE_SECONDS.time(stage="backfill"):
+                    older = await self._crawl(channel, cache, limit, after_since, cache.covered_since, fetched, background)
+                fetched += older
+                cache.covered_since = since_id if len(older) < limit else cache.oldest_id
+            logger.info(f"Completed fetching and cached {len(fetched)} messages for {channel.name} (ID: {channel.id})")
+        except WarmupBudgetSpent:
+            # What was fetched stays cached, but the channel isn't synced and nothing is stored:
+            # past synced_through it may sit above a gap, so the next crawl starts over from there
+            logger.info(f"Warm-up request budget spent while crawling {channel.name} (ID: {channel.id}); keeping {len(cache)} messages unsynced")
+            return len(cache)
+        except discord.errors.Forbidden:
+            logger.warning(f"Skipping channel {channel.name} due to lack of permissions")
+            if cold:
+                self.bot.channel_messages.put(channel.guild.id, channel.id, None)
+            return 0
+        except Exception as e:
+            logger.error(f"Error fetching messages for {channel.name}: {e}")
+            if cold:
+                self.bot.channel_messages.put(channel.guild.id, channel.id, None)
+            return 0
+
+        cache.synced_through = cache.newest_id
+        self.bot.synced_channels.add(channel.id)
+        self.bot.channel_messages.touch(channel.id)
+        self.bot.enforce_guild_cap(channel.guild.id, keep=self.busy_channels())
+        self.bot.enforce_memory_budget(keep=self.busy_channels())
+        with FETCH_STAGE_SECONDS.time(stage="save"):
+            await asyncio.to_thread(self.bot.store.save_messages, fetched)
+            await asyncio.to_thread(self.bot.store.trim_channel, channel.id, MAX_MESSAGES)
+        return len(cache)
+
+    async def _crawl(self, channel, cache: ChannelCache, limit: int, after_id: int, before_id: int, fetched: list,
+                     background=False) -> list:
+        """Walk history newest first between after_id and before_id (exclusive), adding messages to the cache.
+
+        A background crawl raises WarmupBudgetSpent instead of requesting a page past the warm-up budget.
+        """
+        after = discord.Object(id=after_id) if after_id else None
+        before = discord.Object(id=before_id) if before_id else None
+        crawled = []
+        async for msg in channel.history(limit=limit, after=after, before=before, oldest_first=False):
+            if len(crawled) % 100 == 0:
+                # history() requests a page of 100 messages at a time
+                self.history_requests += 1
+                if background:
+                    self.warmup_requests += 1
+                    await self.yield_to_users(channel)
+            message = CachedMessage.from_message(msg)
+            cache.add(message)
+            crawled.append(message)
+            total_messages_fetched = len(fetched) + len(crawled)
+            if total_messages_fetched % 50 == 0:
+                logger.info(f"Fetched {total_messages_fetched} messages so far for {channel.name} (ID: {channel.id})")
+            if background and len(crawled) % 100 == 0 and len(crawled) < limit and self.warmup_budget_spent():
+                raise WarmupBudgetSpent()
+        return crawled
+
+    def busy_channels(self) -> set:
+        """Channels being crawled or waited on by a command, which must not be evicted."""
+        return {channel_id for channel_id, lock in self.fetch_locks.items() if lock.locked()} | set(self.user_channels)
+
+    @staticmethod
+    def can_read_history(channel) -> bool:
+        permissions = channel.permissions_for(channel.guild.me)
+        return permissions.read_messages and permissions.read_message_history
+
+    def needs_fetch(self, channel, since_id: int = 0) -> bool:
+        cache = self.bot.channel_messages.get(channel.id)
+        return channel.id not in self.bot.synced_channels or cache is None or not cache.covers(since_id)
+
+    async def crawl_channels(self, channels: list, progress_message=None, since_id: int = 0):
+        """Fill the cache of every channel that doesn't cover since_id yet, at most GUILD_CRAWL_CONCURRENCY crawls at a time."""
+        pending = [channel for channel in channels if self.needs_fetch(channel, since_id)]
+        if not pending:
+            return
+
+        semaphore = asyncio.Semaphore(config.GUILD_CRAWL_CONCURRENCY)
+        done = 0
+        last_edit = time.monotonic()
+
+        async def crawl(channel):
+            nonlocal done, last_edit
+            async with semaphore:
+                await self.fetch_messages(channel, since_id=since_id)
+            done += 1
+            if progress_message and time.monotonic() - last_edit >= PROGRESS_EDIT_INTERVAL_SECONDS:
+                last_edit = time.monotonic()
+                try:
+                    await progress_message.edit(content=f"Caching channel history... {done}/{len(pending)} channels done")
+                except discord.HTTPException as e:
+                    # A missed progress update mustn't fail the gather and abandon the other crawls
+                    logger.warning(f"Failed to update the /topguild progress after {channel.name} (ID: {channel.id}): {e}")
+
+        logger.info(f"Crawling {len(pending)} uncached channels")
+        await asyncio.gather(*(crawl(channel) for channel in pending))
+
+    async def reconcile_channel(self, channel) -> int:
+        """Re-read the cached window of a channel from history, replacing each cached message's reactions
+        and dropping cached messages that history no longer has."""
+        cache = self.bot.channel_messages.get(channel.id)
+        if not cache:
+            return 0
+
+        # The window as it is now; messages cached while history is read are outside it
+        oldest_id, newest_id = cache.oldest_id, cache.newest_id
+        refreshed = []
+        seen = set()
+        try:
+            async for msg in channel.history(limit=None, after=discord.Object(id=oldest_id - 1), before=discord.Object(id=newest_id + 1)):
+                seen.add(msg.id)
+                if msg.id in cache:
+                    message = CachedMessage.from_message(msg)
+                    cache.add(message)
+                    refreshed.append(message)
+        except discord.HTTPException as e:
+            logger.error(f"Error reconciling messages for {channel.name}: {e}")
+            return 0
+
+        deleted = [message.id for message in cache.recent() if oldest_id <= message.id <= newest_id and message.id not in seen]
+        await self.bot.delete_cached_messages(channel.id, deleted)
+        await asyncio.to_thread(self.bot.store.save_messages, refreshed)
+        logger.info(f"Reconciled {len(refreshed)} cached messages for {channel.name} (ID: {channel.id}), dropped {len(deleted)} deleted ones")
+        return len(refreshed)
+
+    @staticmethod
+    def parse_window(period: str = None, since: str = None, until: str = None) -> tuple:
+        """Turn the period/since/until options into an inclusive (since_id, until_id) snowflake range.
+
+        since and until are ISO dates or datetimes, read as UTC; a plain until date includes that whole day.
+        Raises ValueError for unparseable dates.
+        """
+        since_id = until_id = None
+        if since:
+            since_time = datetime.fromisoformat(since)
+            since_id = discord.utils.time_snowflake(since_time if since_time.tzinfo else since_time.replace(tzinfo=timezone.utc))
+        elif period:
+            # Whole minutes, so repeated queries in the same minute share a query cache key
+            now = discord.utils.utcnow().replace(second=0, microsecond=0)
+            since_id = discord.utils.time_snowflake(now - PERIODS[period])
+        if until:
+            until_time = datetime.fromisoformat(until)
+            if len(until) == 10:
+                until_time += timedelta(days=1)
+            until_id = discord.utils.time_snowflake(until_time if until_time.tzinfo else until_time.replace(tzinfo=timezone.utc)) - 1
+        return since_id, until_id
+
+    @staticmethod
+    def window_note(cache: ChannelCache, since_id: int, until_id: int) -> str:
+        """Say when part of a since/until window is older than the history a full cache keeps, or None if it's all cached."""
+        if cache is None or not cache.covered_since or (not since_id and until_id is None):
+            return None
+        kept = f"Only the newest {MAX_MESSAGES} messages of a channel are kept, back to {discord.utils.snowflake_time(cache.covered_since):%Y-%m-%d}"
+        if until_id is not None and until_id < cache.covered_since:
+            return f"{kept}, so nothing from this window can be shown."
+        if since_id and since_id < cache.covered_since:
+            return f"{kept}; older posts from this window aren't included."
+        return None
+
+    @staticmethod
+    def rank_messages(cache: ChannelCache, show: int, limit: int = None, scored: bool = False, include_set: set = None,
+                      exclude_set: set = None, only_set: set = None, has_media: bool = False,
+                      since_id: int = None, until_id: int = None, rules: ScoringRules = None) -> list:
+        """Return (message, score) for the top `show` cached messages of a /top query, best first.
+
+        `rules` must be the channel's guild rules, which the scored leaderboard was built with.
+        """
+        def passes_filters(msg):
+            if has_media and not msg.has_media:
+                return False
+            if include_set and not any(ReactionProcessor.get_emoji_name(r) in include_set for r in msg.reactions):
+                return False
+            if exclude_set and any(ReactionProcessor.get_emoji_name(r) in exclude_set for r in msg.reactions):
+                return False
+            return True
+
+        if not only_set:
+            # Walk the maintained leaderboard instead of scoring the whole channel
+            leaderboard = cache.leaderboards["scored" if scored else "count"]
+            oldest_id = max(cache.nth_newest_id(limit, until_id) or 0 if limit else 0, since_id or 0)
+            predicate = lambda message_id: (message_id >= oldest_id and (until_id is None or message_id <= until_id)
+                                            and passes_filters(cache.get(message_id)))
+            return [(cache.get(message_id), score) for message_id, score in leaderboard.top(show, predicate, min_score=0 if scored else None)]
+
+        # Score the whole window in one batch over the reaction matrix
+        # Build the matrix first: the vectors must cover every emoji id it uses
+        matrix = cache.matrix()
+        vectors = FetchReactionsCog.emoji_vectors(scored, include_set, exclude_set, only_set, rules)
+        return FetchReactionsCog.rank_matrix(matrix, show, limit, scored, *vectors, has_media, since_id, until_id)
+
+    @staticmethod
+    def emoji_vectors(scored: bool, include_set: set, exclude_set: set, only_set: set, rules: ScoringRules = None) -> tuple:
+        """Return the per-emoji weights and include/exclude masks of a matrix query (masks are None when unused)."""
+        size = len(EMOJI_TABLE)
+        only_mask = name_mask(only_set, size)
+        weights = emoji_weights(rules, size) * only_mask if scored else only_mask.astype(float)
+        include_mask = name_mask(include_set, size) if include_set else None
+        exclude_mask = name_mask(exclude_set, size) if exclude_set else None
+        return weights, include_mask, exclude_mask
+
+    @staticmethod
+    def rank_matrix(matrix: ReactionMatrix, show: int, limit: int, scored: bool, weights: np.ndarray, include_mask: np.ndarray,
+                    exclude_mask: np.ndarray, has_media: bool, since_id: int, until_id: int) -> list:
+        """The matrix half of rank_messages. It only reads its arguments, so it can run on a worker thread."""
+        scores = matrix.sums(weights)
+
+        # Rows are in id order, so the time window is a binary search
+        start = int(np.searchsorted(matrix.ids, since_id, "left")) if since_id else 0
+        end = int(np.searchsorted(matrix.ids, until_id, "right")) if until_id is not None else matrix.size
+        if limit:
+            start = max(start, end - limit)
+        row_mask = np.zeros(matrix.size, dtype=bool)
+        row_mask[start:end] = True
+        if has_media:
+            row_mask &= matrix.has_media
+        if include_mask is not None:
+            row_mask &= matrix.has_any(include_mask)
+        if exclude_mask is not None:
+            row_mask &= ~matrix.has_any(exclude_mask)
+        if scored:
+            row_mask &= scores > 0
+        return matrix.top(scores, show, row_mask)
+
+    async def rank_cache(self, cache: ChannelCache, show: int, limit: int = None, scored: bool = False, include_set: set = None,
+                         exclude_set: set = None, only_set: set = None, has_media: bool = False,
+                         since_id: int = None, until_id: int = None, rules: ScoringRules = None) -> list:
+        """rank_messages, with the matrix build and scoring of caches over OFFLOAD_MIN_MESSAGES on a worker thread.
+
+        Leaderboard queries only walk as far as the top `show` and stay on the loop. The emoji
+        vectors are computed after the matrix, so they cover every emoji id it contains.
+        """
+        if not only_set or len(cache) < config.OFFLOAD_MIN_MESSAGES:
+            return FetchReactionsCog.rank_messages(cache, show, limit, scored, include_set, exclude_set, only_set, has_media, since_id, until_id, rules)
+
+        matrix = cache.fresh_matrix()
+        if matrix is None:
+            version = cache.version
+            matrix = await asyncio.to_thread(ReactionMatrix, cache.snapshot())
+            cache.set_matrix(matrix, version)
+        vectors = FetchReactionsCog.emoji_vectors(scored, include_set, exclude_set, only_set, rules)
+        return await asyncio.to_thread(FetchReactionsCog.rank_matrix, matrix, show, limit, scored, *vectors, has_media, since_id, until_id)
+
+    async def rank_channel(self, channel_id: int, show: int, limit: int = None, scored: bool = False, include_set: frozenset = None,
+                           exclude_set: frozenset = None, only_set: frozenset = None, has_media: bool = False,
+                           since_id: int = None, until_id: int = None) -> list:
+        """rank_cache for a channel, answered from the query cache while the channel hasn't changed."""
+        cache = self.bot.channel_messages[channel_id]
+        self.bot.channel_messages.touch(channel_id)
+        key = (show, limit or None, scored, include_set, exclude_set, only_set, has_media, since_id, until_id)
+        ranked = self.bot.query_cache.get(channel_id, cache, key)
+        if ranked is None:
+            version = cache.version
+            rules = SCORING_RULES.for_guild(self.bot.channel_messages.guild_of(channel_id))
+            ranked = await self.rank_cache(cache, show, limit, scored, include_set, exclude_set, only_set, has_media, since_id, until_id, rules)
+            # An offloaded ranking may have been overtaken by new events; don't cache it under the newer version
+            if cache.version == version:
+                self.bot.query_cache.put(channel_id, cache, key, ranked)
+        return ranked
+
+    @staticmethod
+    def build_embeds(top_posts: list) -> list:
+        """Render the top posts as embeds, folding whatever doesn't fit into a summary embed."""
+        embeds, total_embed_length = [], 0
+        for msg in top_posts[:MAX_EMBEDS_PER_MESSAGE - 1]:  # Reserve one spot for summary if needed
+            reactions_str = ReactionProcessor.process_reactions(msg)
+            content_str = f"{msg.content}\n{reactions_str}\n**[[JUMP]({msg.jump_url})]**"
+            embed = EmbedUtils.create_embed(content_str, msg.image_url)
+            
+            if not EmbedUtils.add_embed(embeds, embed, total_embed_length):
+                break # Stop if adding another embed would exceed the total length limit
+            total_embed_length += len(embed.description)
+
+        # Add a summary embed if there are messages left
+        if len(top_posts) > len(embeds):
+            remaining_messages = top_posts[len(embeds):]
+            summary_str = FetchReactionsCog.summarize_messages(remaining_messages)
+            summary_embed = EmbedUtils.create_embed(summary_str)
+            EmbedUtils.add_embed(embeds, summary_embed, total_embed_length)
+        return embeds
+
+    async def stream_preview(self, channel, message, show: int, ranking: dict, started: float):
+        """Until cancelled, edit `message` every TOP_PREVIEW_INTERVAL_SECONDS with the leaders among the messages fetched so far.
+
+        Runs beside the crawl rather than inside it, so history pages never wait on an edit.
+        With previews disabled it only shows the fetch progress.
+        """
+        interval = config.TOP_PREVIEW_INTERVAL_SECONDS or PROGRESS_EDIT_INTERVAL_SECONDS
+        # The first preview comes sooner, as soon as the first pages are likely in
+        delay = interval / 2
+        shown = None
+        while True:
+            await asyncio.sleep(delay)
+            delay = interval
+            cache = self.bot.channel_messages.get(channel.id)
+            if not cache or shown == (cache, cache.version):
+                continue
+            shown = (cache, cache.version)
             try:
-                async for msg in channel.history(limit=MAX_MESSAGES):
-                    self.bot.channel_messages[channel.id].append(msg)
-                    message_count += 1
-                    total_messages_fetched += 1
-                    if message_count % 50 == 0:
-                        logger.info(f"Fetched {total_messages_fetched} messages so far for {channel.name} (ID: {channel.id})")
-                        if interaction and initial_message:
-                            await initial_message.edit(content=self.get_progress(total_messages_fetched))
-                logger.info(f"Completed fetching and cached {total_messages_fetched} messages for {channel.name} (ID: {channel.id})")
-            except discord.errors.Forbidden:
-                logger.warning(f"Skipping channel {channel.name} due to lack of permissions")
-                self.bot.channel_messages[channel.id] = None
-            except Exception as e:
-                logger.error(f"Error fetching messages for {channel.name}: {e}")
-                self.bot.channel_messages[channel.id] = None
-
-            return total_messages_fetched
+                if config.TOP_PREVIEW_INTERVAL_SECONDS:
+                    ranked = await self.rank_cache(cache, show, **ranking, rules=SCORING_RULES.for_guild(channel.guild.id))
+                    await message.edit(content=f"{self.get_progress(len(cache))}\nTop posts so far:",
+                                       embeds=FetchReactionsCog.build_embeds([msg for msg, _ in ranked]))
+                    if started is not None:
+                        COMMAND_STAGE_SECONDS.observe(time.perf_counter() - started, command="top", stage="first_preview")
+                        started = None
+                else:
+                    await message.edit(content=self.get_progress(len(cache)))
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to update the /top preview in {channel.name} (ID: {channel.id}): {e}")
+
+    @contextlib.asynccontextmanager
+    async def previewing(self, channel, message, show: int, ranking: dict, started: float):
+        """Run stream_preview for the duration of the with block."""
+        task = asyncio.create_task(self.stream_preview(channel, message, show, ranking, started))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
 
     def get_progress(self, total_messages_fetched):
         return f"Performing one-time history cache. Results will appear here when complete... {total_messages_fetched} messages fetched out of max {MAX_MESSAGES}"
 
     @app_commands.command(name="top")
+    @app_commands.guild_only()
     @app_commands.describe(
         limit="The most recent N messages to consider.",
         show="The number of top messages to display.",
@@ -69,75 +532,117 @@ class FetchReactionsCog(commands.Cog):
         exclude="Space-separated emojis: hide messages that have any of these.",
         only="Space-separated emojis: only count these emojis toward the score.",
         has_media="Only show messages that contain an attachment or link.",
+        period="Only consider messages from the last day, week, month or year (ignored when since is given).",
+        since="Only consider messages posted on or after this date (YYYY-MM-DD, UTC).",
+        until="Only consider messages posted on or before this date (YYYY-MM-DD, UTC).",
     )
-    async def get_top_reaction_posts(self, interaction: discord.Interaction, limit: int = None, show: int = 5, scored: bool = False, include: str = None, exclude: str = None, only: str = None, has_media: bool = False):
+    async def get_top_reaction_posts(self, interaction: discord.Interaction, limit: int = None, show: int = 5, scored: bool = False, include: str = None, exclude: str = None, only: str = None, has_media: bool = False, period: Literal["day", "week", "month", "year"] = None, since: str = None, until: str = None):
         """Fetch top reaction posts in a channel."""
         # Show message in docker logs
         logger.info(f"Fetching top {show} from {limit} messages in {interaction.channel.name}")
 
         channel = interaction.channel
+        start = time.perf_counter()
         await interaction.response.defer(ephemeral=True)
 
-        if channel.id not in self.bot.channel_messages or self.bot.channel_messages[channel.id] is None:
-            initial_message = await interaction.followup.send(self.get_progress(0))
-            message_count = await self.fetch_messages(channel, interaction, initial_message)
-            if message_count == 0:
-                await initial_message.edit(content="Unable to fetch messages for this channel.")
-                return
-        else:
-            initial_message = await interaction.followup.send("Fetching top posts...")
-
-        messages = self.bot.channel_messages.get(channel.id, [])
-        if limit:
-            messages = messages[:limit]
+        try:
+            since_id, until_id = FetchReactionsCog.parse_window(period, since, until)
+        except ValueError:
+            await interaction.followup.send("Dates must look like 2024-05-31.", ephemeral=True)
+            return
 
         include_set = ReactionProcessor.parse_emoji_input(include) if include else None
         exclude_set = ReactionProcessor.parse_emoji_input(exclude) if exclude else None
         only_set = ReactionProcessor.parse_emoji_input(only) if only else None
 
-        if has_media:
-            messages = [msg for msg in messages if msg.attachments or any(
-                e.type in ("image", "video", "gifv") or e.image or e.thumbnail or e.video
-                for e in msg.embeds
-            )]
-        if include_set:
-            messages = [msg for msg in messages if any(ReactionProcessor.get_emoji_name(r) in include_set for r in msg.reactions)]
-        if exclude_set:
-            messages = [msg for msg in messages if not any(ReactionProcessor.get_emoji_name(r) in exclude_set for r in msg.reactions)]
+        # Held until the ranking is done, so the memory budget can't evict the channel while the followups are in flight
+        async with self.user_crawl([channel.id]):
+            if self.needs_fetch(channel, since_id or 0):
+                initial_message = await interaction.followup.send(self.get_progress(0))
+                ranking = dict(limit=limit, scored=scored, include_set=include_set, exclude_set=exclude_set, only_set=only_set,
+                               has_media=has_media, since_id=since_id, until_id=until_id)
+                with COMMAND_STAGE_SECONDS.time(command="top", stage="fetch"):
+                    async with self.previewing(channel, initial_message, show, ranking, start):
+                        message_count = await self.fetch_messages(channel, since_id=since_id or 0)
+                if message_count == 0:
+                    await initial_message.edit(content="Unable to fetch messages for this channel.", embeds=[])
+                    return
+            else:
+                initial_message = await interaction.followup.send("Fetching top posts...")
 
-        if scored:
-            score_fn = lambda msg: ReactionProcessor.calculate_score(msg, only_set)
-        elif only_set:
-            score_fn = lambda msg: sum(r.count for r in msg.reactions if ReactionProcessor.get_emoji_name(r) in only_set)
-        else:
-            score_fn = lambda msg: sum(r.count for r in msg.reactions)
+            with COMMAND_STAGE_SECONDS.time(command="top", stage="rank"):
+                ranked = await self.rank_channel(channel.id, show, limit, scored, include_set, exclude_set, only_set, has_media, since_id, until_id)
+        with COMMAND_STAGE_SECONDS.time(command="top", stage="embed"):
+            embeds = FetchReactionsCog.build_embeds([msg for msg, _ in ranked])
+        # Discord rejects a message with neither content nor embeds
+        note = FetchReactionsCog.window_note(self.bot.channel_messages.get(channel.id), since_id, until_id)
+        content = note or ("" if embeds else NO_MATCHES)
 
-        scored_messages = [(msg, score_fn(msg)) for msg in messages]
-        if scored:
-            scored_messages = [(msg, score) for msg, score in scored_messages if score > 0]
-        top_posts = [msg for msg, _ in sorted(scored_messages, key=lambda x: x[1], reverse=True)[:show]]
-        
-        embeds, total_embed_length = [], 0
-        for msg in top_posts[:MAX_EMBEDS_PER_MESSAGE - 1]:  # Reserve one spot for summary if needed
-            reactions_str = ReactionProcessor.process_reactions(msg)
-            content_str = f"{msg.content}\n{reactions_str}\n**[[JUMP]({msg.jump_url})]**"
-            embed = EmbedUtils.create_embed(content_str, msg.attachments)
-            
-            if not EmbedUtils.add_embed(embeds, embed, total_embed_length):
-                break # Stop if adding another embed would exceed the total length limit
-            total_embed_length += len(embed.description)
+        with COMMAND_STAGE_SECONDS.time(command="top", stage="edit"):
+            if initial_message:
+                await initial_message.edit(content=content, embeds=embeds)
+            else:
+                await interaction.followup.send(content=content or None, embeds=embeds, ephemeral=True)
+        COMMAND_STAGE_SECONDS.observe(time.perf_counter() - start, command="top", stage="total")
+        await self.bot.record_use([channel.id])
 
-        # Add a summary embed if there are messages left
-        if len(top_posts) > len(embeds):
-            remaining_messages = top_posts[len(embeds):]
-            summary_str = FetchReactionsCog.summarize_messages(remaining_messages)
-            summary_embed = EmbedUtils.create_embed(summary_str)
-            EmbedUtils.add_embed(embeds, summary_embed, total_embed_length)
+    @app_commands.command(name="topguild")
+    @app_commands.guild_only()
+    @app_commands.describe(
+        limit="The most recent N messages to consider in each channel.",
+        show="The number of top messages to display.",
+        scored="Rank by weighted score (positive minus negative reactions) instead of total reactions.",
+        include="Space-separated emojis: only show messages that have at least one of these.",
+        exclude="Space-separated emojis: hide messages that have any of these.",
+        only="Space-separated emojis: only count these emojis toward the score.",
+        has_media="Only show messages that contain an attachment or link.",
+        period="Only consider messages from the last day, week, month or year (ignored when since is given).",
+        since="Only consider messages posted on or after this date (YYYY-MM-DD, UTC).",
+        until="Only consider messages posted on or before this date (YYYY-MM-DD, UTC).",
+    )
+    async def get_top_guild_posts(self, interaction: discord.Interaction, limit: int = None, show: int = 5, scored: bool = False, include: str = None, exclude: str = None, only: str = None, has_media: bool = False, period: Literal["day", "week", "month", "year"] = None, since: str = None, until: str = None):
+        """Fetch top reaction posts across every text channel of the guild."""
+        logger.info(f"Fetching top {show} from {limit} messages per channel across the guild")
 
-        if initial_message:
-            await initial_message.edit(content="", embeds=embeds)
-        else:
-            await interaction.followup.send(embeds=embeds, ephemeral=True)
+        start = time.perf_counter()
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            since_id, until_id = FetchReactionsCog.parse_window(period, since, until)
+        except ValueError:
+            await interaction.followup.send("Dates must look like 2024-05-31.", ephemeral=True)
+            return
+
+        initial_message = await interaction.followup.send("Fetching top posts across all channels...")
+
+        # Skip channels we can't read up front rather than waiting for a Forbidden from each of them
+        channels = [channel for channel in await self.bot.get_all_channels(interaction.guild) if FetchReactionsCog.can_read_history(channel)]
+        include_set = ReactionProcessor.parse_emoji_input(include) if include else None
+        exclude_set = ReactionProcessor.parse_emoji_input(exclude) if exclude else None
+        only_set = ReactionProcessor.parse_emoji_input(only) if only else None
+
+        # Held until the ranking is done, so one channel's crawl can't evict another that's about to be ranked
+        async with self.user_crawl([channel.id for channel in channels]):
+            with COMMAND_STAGE_SECONDS.time(command="topguild", stage="fetch"):
+                await self.crawl_channels(channels, initial_message, since_id or 0)
+
+            # Each channel's own top `show` is enough to find the global top `show`
+            with COMMAND_STAGE_SECONDS.time(command="topguild", stage="rank"):
+                candidates = []
+                for channel in channels:
+                    if self.bot.channel_messages.get(channel.id):
+                        candidates.extend(await self.rank_channel(channel.id, show, limit, scored, include_set, exclude_set, only_set, has_media, since_id, until_id))
+                top_posts = [msg for msg, _ in heapq.nlargest(show, candidates, key=lambda pair: (pair[1], pair[0].id))]
+        with COMMAND_STAGE_SECONDS.time(command="topguild", stage="embed"):
+            embeds = FetchReactionsCog.build_embeds(top_posts)
+        truncated = any(FetchReactionsCog.window_note(self.bot.channel_messages.get(channel.id), since_id, until_id) for channel in channels)
+        content = (f"Only the newest {MAX_MESSAGES} messages of each channel are kept, so older posts from this window aren't included."
+                   if truncated else "" if embeds else NO_MATCHES)
+
+        with COMMAND_STAGE_SECONDS.time(command="topguild", stage="edit"):
+            await initial_message.edit(content=content, embeds=embeds)
+        COMMAND_STAGE_SECONDS.observe(time.perf_counter() - start, command="topguild", stage="total")
+        await self.bot.record_use([channel.id for channel in channels if self.bot.channel_messages.get(channel.id)])
 
 async def setup(bot):
     await bot.add_cog(FetchReactionsCog(bot=bot))
@@ -0,0 +1,19 @@
+import pytest
+from benchmarks.harness import make_bot
+from config import config
+from slash_commands import fetch_reactions
+
+@pytest.fixture
+def start_bot(tmp_path, monkeypatch):
+    """Start an offline TopReactionsBot from the benchmark harness, storing into tmp_path.
+
+    benchmarks.harness.make_bot overrides config settings; they're put back after the test.
+    """
+    for name in ("CACHE_DB_PATH", "RECONCILE_INTERVAL_MINUTES", "WARMUP_ENABLED", "REFRESH_DEBOUNCE_SECONDS", "MAX_MESSAGES"):
+        monkeypatch.setattr(config, name, getattr(config, name))
+    monkeypatch.setattr(fetch_reactions, "MAX_MESSAGES", fetch_reactions.MAX_MESSAGES)
+
+    async def start(cache_size: int = 10000):
+        return await make_bot(str(tmp_path), cache_size, None)
+    return start
+
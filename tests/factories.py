@@ -0,0 +1,15 @@
+from util.cached_message import CachedMessage, CachedReaction, EMOJI_TABLE
+
+CHANNEL_ID = 200000000000000000
+GUILD_ID = 100000000000000000
+
+def message(message_id: int, reactions: dict = None, author_id: int = 1, media: bool = False, channel_id: int = CHANNEL_ID) -> CachedMessage:
+    """A cached message with {emoji: count} reactions, Unicode emojis rendered as themselves."""
+    return CachedMessage(message_id, channel_id, GUILD_ID, author_id, f"message {message_id}", has_attachments=media,
+                         reactions=[CachedReaction(EMOJI_TABLE.intern(name, name), count) for name, count in (reactions or {}).items()])
+
+
+async def stop_bot(bot):
+    await bot.remove_cog("FetchReactionsCog")
+    await bot.saver.drain()
+    bot.store.close()
@@ -0,0 +1,100 @@
+import asyncio
+import discord
+from benchmarks import events
+from benchmarks.fakes import SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID, run_top
+from benchmarks.synthetic import make_channel, make_guild, message_id_at
+from util.channel_cache import ChannelCache
+from tests.factories import message, stop_bot
+
+def ids(cache):
+    return [msg.id for msg in cache.snapshot()]
+
+
+def test_messages_are_kept_in_id_order():
+    cache = ChannelCache(10, [message(30), message(10), message(20)])
+    assert ids(cache) == [10, 20, 30]
+    assert (cache.oldest_id, cache.newest_id) == (10, 30)
+    assert [msg.id for msg in cache.recent(2)] == [30, 20]
+
+
+def test_full_cache_evicts_oldest_and_rejects_older():
+    cache = ChannelCache(3, [message(i) for i in (10, 20, 30)])
+    assert cache.add(message(40))
+    assert ids(cache) == [20, 30, 40]
+    assert not cache.add(message(5))
+    assert cache.add(message(25))
+    assert ids(cache) == [25, 30, 40]
+
+
+def test_trim_keeps_the_newest_and_moves_covered_since():
+    cache = ChannelCache(10, [message(i, {"👍": i}) for i in range(1, 8)])
+    cache.trim(3)
+    assert ids(cache) == [5, 6, 7]
+    assert cache.covered_since == 5
+    assert [message_id for message_id, _ in cache.leaderboards["count"].top(10)] == [7, 6, 5]
+    assert sum(cache.tally.emojis.values()) == 5 + 6 + 7
+    assert [msg.id for msg in cache.recent(2)] == [7, 6]
+
+
+def test_remove_and_nth_newest_id():
+    cache = ChannelCache(10, [message(i) for i in (10, 20, 30, 40)])
+    assert cache.nth_newest_id(2) == 30
+    assert cache.nth_newest_id(2, until_id=25) == 10
+    assert cache.nth_newest_id(9) == 10
+    assert cache.remove(30).id == 30
+    assert cache.remove(30) is None
+    assert ids(cache) == [10, 20, 40]
+    assert 30 not in cache and cache.leaderboards["count"].score(30) is None
+
+
+def test_covered_since_follows_the_oldest_message():
+    assert ChannelCache(10).covered_since is None
+    cache = ChannelCache(4, [message(30), message(10), message(20)])
+    assert cache.covered_since == 10
+    assert cache.covers(10) and cache.covers(25) and not cache.covers(5)
+    cache.add(message(40))
+    cache.add(message(50))
+    assert cache.covered_since == 20
+    assert cache.covers(1)   # Full, so as deep as it can get
+
+
+def test_admits_only_messages_inside_the_covered_range():
+    assert not ChannelCache(10).admits(5)
+    cache = ChannelCache(10, [message(20), message(30)])
+    assert cache.admits(20) and cache.admits(25) and cache.admits(40)
+    assert not cache.admits(10)
+    cache.covered_since = None
+    assert cache.admits(30) and not cache.admits(25)
+
+
+def test_backfill_continues_from_covered_since(start_bot):
+    async def scenario():
+        bot, cog = await start_bot()
+        try:
+            guild = make_guild(bot._connection)
+            channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "backfill", SyntheticTextChannel, count=3000)
+            await run_top(cog, channel, 0, since=discord.utils.snowflake_time(message_id_at(2500)).isoformat())
+            cache = bot.channel_messages[channel.id]
+            assert len(cache) == 501
+            assert message_id_at(2499) < cache.covered_since <= message_id_at(2500)
+
+            # An edit from below the covered range must not become the new oldest message
+            await events.dispatch(bot, "MESSAGE_UPDATE", {"id": str(message_id_at(100)), "channel_id": str(channel.id),
+                                                          "guild_id": str(guild.id), "content": "edited"})
+            await bot.refresher.drain()
+            assert message_id_at(100) not in cache
+
+            await run_top(cog, channel, 0)
+            assert ids(cache) == [message_id_at(i) for i in range(1, 3001)]
+
+            # After a trim, the store backfills what was dropped without another crawl
+            cache.trim(1000)
+            requests = channel.requests
+            await run_top(cog, channel, 0)
+            assert ids(cache) == [message_id_at(i) for i in range(1, 3001)]
+            assert channel.requests == requests
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import asyncio
+import discord
+from benchmarks.fakes import NotFoundResponse, SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID
+from benchmarks.synthetic import make_channel, make_guild
+from slash_commands import fetch_reactions
+from tests.factories import stop_bot
+
+class FailingMessage:
+    def __init__(self):
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        self.edits += 1
+        raise discord.HTTPException(NotFoundResponse(), "Unknown Message")
+
+
+def test_a_failed_progress_edit_leaves_the_other_crawls_running(start_bot, monkeypatch):
+    monkeypatch.setattr(fetch_reactions, "PROGRESS_EDIT_INTERVAL_SECONDS", 0)
+
+    async def scenario():
+        bot, cog = await start_bot()
+        try:
+            guild = make_guild(bot._connection)
+            channels = [make_channel(bot._connection, guild, FIRST_CHANNEL_ID + i, f"channel{i}", SyntheticTextChannel, count=300 * (i + 1))
+                        for i in range(3)]
+            progress = FailingMessage()
+            await cog.crawl_channels(channels, progress)
+            assert progress.edits == 3
+            assert [len(bot.channel_messages[channel.id]) for channel in channels] == [300, 600, 900]
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
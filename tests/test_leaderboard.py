@@ -0,0 +1,42 @@
+from util.leaderboard import Leaderboard
+from tests.factories import message
+
+def count(msg):
+    return sum(r.count for r in msg.reactions)
+
+
+def test_top_orders_by_score_then_newest():
+    board = Leaderboard(count)
+    for msg in [message(1, {"👍": 3}), message(2, {"👍": 5}), message(3, {"👍": 3}), message(4)]:
+        board.update(msg)
+    assert list(board.top(10)) == [(2, 5), (3, 3), (1, 3), (4, 0)]
+    assert list(board.top(2)) == [(2, 5), (3, 3)]
+
+
+def test_update_replaces_the_previous_score():
+    board = Leaderboard(count)
+    board.update(message(1, {"👍": 3}))
+    board.update(message(2, {"👍": 2}))
+    board.update(message(1, {"👍": 1}))
+    assert len(board) == 2
+    assert board.score(1) == 1
+    assert list(board.top(10)) == [(2, 2), (1, 1)]
+
+
+def test_remove():
+    board = Leaderboard(count)
+    board.update(message(1, {"👍": 3}))
+    board.update(message(2, {"👍": 2}))
+    board.remove(1)
+    board.remove(99)
+    assert len(board) == 1
+    assert board.score(1) is None
+    assert list(board.top(10)) == [(2, 2)]
+
+
+def test_top_filters_and_stops_at_min_score():
+    board = Leaderboard(count)
+    for message_id in range(1, 7):
+        board.update(message(message_id, {"👍": message_id - 1}))
+    assert list(board.top(2, predicate=lambda message_id: message_id % 2 == 1)) == [(5, 4), (3, 2)]
+    assert list(board.top(10, min_score=2)) == [(6, 5), (5, 4), (4, 3)]
@@ -0,0 +1,55 @@
+import json
+import logging
+from logger import EventSampler, JsonFormatter, TextFormatter, setup_logging, stop_logging
+
+def record(event=None, created=0.0, exc_info=None, **extra):
+    record = logging.LogRecord("root", logging.INFO, __file__, 1, "Reaction add in %s", (5,), exc_info)
+    record.created = created
+    if event is not None:
+        record.event = event
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampler_limits_each_event_per_second_and_reports_the_suppressed():
+    sampler = EventSampler(2)
+    assert [sampler.filter(record("add", 0.1 * i)) for i in range(5)] == [True, True, False, False, False]
+    assert sampler.filter(record("remove", 0.5))
+    assert sampler.filter(record()) and sampler.filter(record())
+
+    first = record("add", 1.2)
+    assert sampler.filter(first) and first.suppressed == 3
+    second = record("add", 1.3)
+    assert sampler.filter(second) and not hasattr(second, "suppressed")
+
+
+def test_text_formatter_notes_suppressed_records():
+    assert TextFormatter().format(record(suppressed=3)).endswith("Reaction add in 5 (+3 similar suppressed)")
+    assert TextFormatter().format(record()).endswith("Reaction add in 5")
+
+
+def test_json_formatter_puts_extra_fields_at_the_top_level():
+    entry = json.loads(JsonFormatter().format(record("add", channel_id=200, message_id=300)))
+    assert entry["message"] == "Reaction add in 5" and entry["level"] == "INFO"
+    assert (entry["event"], entry["channel_id"], entry["message_id"]) == ("add", 200, 300)
+    assert "args" not in entry and "exception" not in entry
+
+
+def test_queued_records_keep_their_fields_and_tracebacks(tmp_path):
+    path = tmp_path / "bot.log"
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    setup_logging(filename=str(path), json_format=True, stream=None)
+    try:
+        root.info("Reaction add in %s", 5, extra={"event": "add", "channel_id": 200})
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            root.exception("Failed")
+    finally:
+        stop_logging()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    first, second = (json.loads(line) for line in path.read_text(encoding="utf-8").splitlines())
+    assert (first["message"], first["event"], first["channel_id"]) == ("Reaction add in 5", "add", 200)
+    assert second["message"] == "Failed" and "ValueError: broken" in second["exception"]
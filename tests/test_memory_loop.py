@@ -0,0 +1,25 @@
+import asyncio
+from util.channel_cache import ChannelCache
+from tests.factories import message, stop_bot
+
+def channel(channel_id: int, count: int) -> ChannelCache:
+    return ChannelCache(100, [message(channel_id * 1000 + i, channel_id=channel_id) for i in range(count)])
+
+
+def test_memory_loop_brings_each_guild_under_its_cap(start_bot):
+    async def scenario():
+        bot, cog = await start_bot()
+        try:
+            bot.channel_messages.guild_max_messages = 15
+            for channel_id, guild_id in ((1, 10), (2, 10), (3, 10), (4, 20)):
+                bot.channel_messages.put(guild_id, channel_id, channel(channel_id, 10))
+                bot.synced_channels.add(channel_id)
+            # Channel 1 is in use by a command, so channel 2 goes instead
+            async with cog.user_crawl([1]):
+                await cog.memory_loop()
+            assert sorted(bot.channel_messages.channels()) == [1, 4]
+            assert bot.synced_channels == {1, 4}
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import pytest
+from util import message_cache
+from util.channel_cache import ChannelCache
+from util.message_cache import MessageCache
+from tests.factories import message
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(message_cache.time, "monotonic", clock)
+    return clock
+
+
+def channel(channel_id, count=10):
+    return ChannelCache(100, [message(channel_id * 1000 + i, {"👍": 1}, channel_id=channel_id) for i in range(count)])
+
+
+@pytest.fixture
+def caches(clock):
+    """Channels 1 and 2 of guild 10 and channel 3 of guild 20, used in that order, ten messages each."""
+    caches = MessageCache(guild_max_messages=1000)
+    for channel_id, guild_id in ((1, 10), (2, 10), (3, 20)):
+        caches.put(guild_id, channel_id, channel(channel_id))
+        clock.now += 1
+    clock.now = 100
+    return caches
+
+
+def test_under_budget_changes_nothing(caches):
+    assert caches.enforce_budget(30, 0, idle_seconds=50, trim_to=5) == []
+    assert caches.message_count() == 30
+
+
+def test_idle_channels_go_first_least_recently_used_first(caches):
+    assert caches.enforce_budget(25, 0, idle_seconds=50, trim_to=5) == [1]
+    caches.touch(1)
+    assert caches.enforce_budget(15, 0, idle_seconds=50, trim_to=5) == [2, 3]
+    assert caches.message_count() == 30   # Evicting is up to the caller
+
+
+def test_busy_channels_are_trimmed_before_they_are_dropped(caches):
+    assert caches.enforce_budget(25, 0, idle_seconds=1000, trim_to=5) == []
+    assert [len(caches[channel_id]) for channel_id in (1, 2, 3)] == [5, 10, 10]
+    assert caches.enforce_budget(12, 0, idle_seconds=1000, trim_to=5) == [1]
+    assert [len(caches[channel_id]) for channel_id in (1, 2, 3)] == [5, 5, 5]
+
+
+def test_kept_channels_are_left_alone(caches):
+    assert caches.enforce_budget(12, 0, idle_seconds=50, trim_to=5, keep={1, 2}) == [3]
+    assert caches.enforce_budget(5, 0, idle_seconds=1000, trim_to=5, keep={1, 2}) == [3]
+    assert len(caches[1]) == len(caches[2]) == 10
+
+
+def test_byte_budget(caches):
+    per_channel = caches[1].estimated_bytes()
+    assert caches.enforce_budget(0, 2 * per_channel, idle_seconds=50, trim_to=5) == [1]
+
+
+def test_guild_tallies_follow_their_channels(caches):
+    assert sum(caches.tally(10).emojis.values()) == 20
+    assert sum(caches.tally(20).emojis.values()) == 10
+    caches[1].trim(5)
+    caches.discard(2)
+    assert sum(caches.tally(10).emojis.values()) == 5
+    caches.put(10, 1, channel(1, 3))
+    assert sum(caches.tally(10).emojis.values()) == 3
+    assert caches.guild_of(3) == 20 and caches.guild_of(2) is None
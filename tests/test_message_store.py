@@ -0,0 +1,115 @@
+import asyncio
+from benchmarks import events
+from benchmarks.fakes import SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID, run_top
+from benchmarks.synthetic import make_channel, make_guild, message_id_at, payload_at
+from config import config
+from util.message_store import MessageStore
+from tests.factories import CHANNEL_ID, message, stop_bot
+
+def ids(messages):
+    return [msg.id for msg in messages]
+
+
+def test_round_trip_keeps_reactions_in_order(tmp_path):
+    store = MessageStore(str(tmp_path / "store.db"))
+    saved = message(5, {"👍": 2, "🔥": 1}, author_id=7, media=True)
+    store.save_messages([saved, message(6)])
+    loaded = store.load_channel(CHANNEL_ID, 10)
+    assert ids(loaded) == [6, 5]
+    restored = loaded[1]
+    assert (restored.author_id, restored.content, restored.has_attachments) == (7, "message 5", True)
+    assert [(r.emoji, r.count) for r in restored.reactions] == [(r.emoji, r.count) for r in saved.reactions]
+
+    # Saving again replaces the reactions instead of adding to them
+    store.save_messages([message(5, {"😂": 3})])
+    assert [(r.name, r.count) for r in store.load_channel(CHANNEL_ID, 1, before_id=6)[0].reactions] == [("😂", 3)]
+    store.close()
+
+
+def test_limit_before_trim_and_delete(tmp_path):
+    store = MessageStore(str(tmp_path / "store.db"))
+    store.save_messages([message(i, {"👍": 1}) for i in range(1, 11)])
+    store.save_messages([message(100, channel_id=CHANNEL_ID + 1)])
+    assert ids(store.load_channel(CHANNEL_ID, 3)) == [10, 9, 8]
+    assert ids(store.load_channel(CHANNEL_ID, 3, before_id=5)) == [4, 3, 2]
+    assert store.load_channel(CHANNEL_ID, 0) == []
+
+    store.trim_channel(CHANNEL_ID, 4)
+    store.delete_messages([9, 100])
+    assert ids(store.load_channel(CHANNEL_ID, 10)) == [10, 8, 7]
+    assert store.load_channel(CHANNEL_ID + 1, 10) == []
+    assert store._conn.execute("SELECT COUNT(*) FROM reactions").fetchone()[0] == 3
+    store.close()
+
+
+def test_restart_catches_up_from_the_newest_stored_message(start_bot):
+    async def scenario():
+        bot, cog = await start_bot()
+        guild = make_guild(bot._connection)
+        channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "restart", SyntheticTextChannel, count=1000)
+        await run_top(cog, channel, 0)
+        await stop_bot(bot)
+
+        # 200 messages posted while the bot was down, then one live message before the first /top
+        bot, cog = await start_bot()
+        try:
+            guild = make_guild(bot._connection)
+            channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "restart", SyntheticTextChannel, count=1200)
+            await bot.load_stored_channels()
+            cache = bot.channel_messages[channel.id]
+            assert len(cache) == 1000 and cache.synced_through == message_id_at(1000)
+
+            live = payload_at(1201, channel.id)
+            live["author"]["id"] = "2"
+            await events.dispatch(bot, "MESSAGE_CREATE", live)
+            await bot.saver.drain()
+            assert message_id_at(1201) in cache
+            # Not stored yet: the next startup would catch up from it and skip the 200
+            assert bot.store.load_channel(channel.id, 1)[0].id == message_id_at(1000)
+
+            requests = channel.requests
+            await run_top(cog, channel, 0)
+            expected = [message_id_at(i) for i in range(1, 1202)]
+            assert [msg.id for msg in cache.snapshot()] == expected
+            assert channel.requests - requests == 3
+            assert ids(bot.store.load_channel(channel.id, 5000)) == expected[::-1]
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
+
+
+def test_channels_by_use_puts_recently_used_first(tmp_path):
+    store = MessageStore(str(tmp_path / "store.db"))
+    for channel_id, newest in ((1, 10), (2, 30), (3, 20), (4, 40)):
+        store.save_messages([message(channel_id * 100 + i, channel_id=channel_id) for i in range(newest // 10)])
+    store.mark_used([3], 100.0)
+    store.mark_used([1], 200.0)
+    # Unused channels follow, most recently active first
+    assert [row[0] for row in store.channels_by_use()] == [1, 3, 4, 2]
+    assert store.channels_by_use()[0] == (1, message(0).guild_id, 1)
+    store.close()
+
+
+def test_startup_loads_the_most_recently_used_channels_that_fit(start_bot, monkeypatch):
+    async def scenario():
+        bot, _ = await start_bot()
+        try:
+            for channel_id in range(1, 6):
+                bot.store.save_messages([message(channel_id * 1000 + i, channel_id=channel_id) for i in range(10)])
+            bot.store.save_messages([message(6000 + i, channel_id=6) for i in range(30)])
+            bot.store.mark_used([1, 2, 3, 4, 5, 6], 1.0)
+            bot.store.mark_used([6], 5.0)
+            bot.store.mark_used([4], 4.0)
+            bot.store.mark_used([2], 3.0)
+
+            # Channel 6 is over the guild cap by itself; 4 and 2 fit, and the budget is full after them
+            monkeypatch.setattr(config, "GUILD_MAX_MESSAGES", 25)
+            monkeypatch.setattr(config, "CACHE_MAX_MESSAGES", 25)
+            await bot.load_stored_channels()
+            assert [channel_id for channel_id, _ in bot.channel_messages.least_recently_used()] == [2, 4]
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
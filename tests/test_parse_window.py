@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+import discord
+import pytest
+from slash_commands.fetch_reactions import FetchReactionsCog
+
+def snowflake(*args, **kwargs):
+    return discord.utils.time_snowflake(datetime(*args, tzinfo=timezone.utc, **kwargs))
+
+
+def test_dates_are_utc_and_until_dates_include_the_whole_day():
+    since_id, until_id = FetchReactionsCog.parse_window(since="2024-03-01", until="2024-03-02")
+    assert since_id == snowflake(2024, 3, 1)
+    assert until_id == snowflake(2024, 3, 3) - 1
+
+
+def test_datetimes_and_offsets():
+    since_id, until_id = FetchReactionsCog.parse_window(since="2024-03-01T12:00:00+02:00", until="2024-03-02T06:30")
+    assert since_id == snowflake(2024, 3, 1, 10)
+    assert until_id == snowflake(2024, 3, 2, 6, 30) - 1
+
+
+def test_period_starts_on_a_whole_minute():
+    since_id, until_id = FetchReactionsCog.parse_window(period="week")
+    now = discord.utils.utcnow()
+    start = discord.utils.snowflake_time(since_id)
+    assert until_id is None
+    assert start.second == 0 and start.microsecond == 0
+    assert timedelta(weeks=1) <= now - start < timedelta(weeks=1, minutes=1)
+
+
+def test_since_overrides_period_and_nothing_means_everything():
+    assert FetchReactionsCog.parse_window(period="day", since="2024-03-01")[0] == snowflake(2024, 3, 1)
+    assert FetchReactionsCog.parse_window() == (None, None)
+
+
+def test_bad_dates_raise_value_error():
+    with pytest.raises(ValueError):
+        FetchReactionsCog.parse_window(since="last tuesday")
@@ -0,0 +1,36 @@
+from util.channel_cache import ChannelCache
+from util.query_cache import QueryCache
+from tests.factories import message
+
+def test_hit_until_the_channel_changes():
+    queries = QueryCache()
+    cache = ChannelCache(10, [message(1, {"👍": 1})])
+    queries.put(5, cache, "top", ["result"])
+    assert queries.get(5, cache, "top") == ["result"]
+    assert queries.get(5, cache, "other") is None
+
+    cache.add(message(2))
+    assert queries.get(5, cache, "top") is None
+    queries.put(5, cache, "top", ["new"])
+    cache.add(message(2, {"👍": 1}))
+    assert queries.get(5, cache, "top") is None
+    assert (queries.hits, queries.misses) == (1, 3)
+
+
+def test_a_replaced_cache_or_discard_invalidates():
+    queries = QueryCache()
+    old, new = ChannelCache(10), ChannelCache(10)
+    queries.put(5, old, "top", ["old"])
+    assert new.version == old.version
+    assert queries.get(5, new, "top") is None
+    queries.discard(5)
+    assert queries.get(5, old, "top") is None
+
+
+def test_keeps_the_newest_queries_per_channel():
+    queries = QueryCache(max_queries_per_channel=2)
+    cache = ChannelCache(10)
+    for key in ("a", "b", "c"):
+        queries.put(5, cache, key, key)
+    assert queries.get(5, cache, "a") is None
+    assert queries.get(5, cache, "b") == "b" and queries.get(5, cache, "c") == "c"
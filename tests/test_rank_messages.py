@@ -0,0 +1,68 @@
+import random
+import pytest
+from slash_commands.fetch_reactions import FetchReactionsCog
+from util.channel_cache import ChannelCache
+from util.reaction_processor import ReactionProcessor
+from util.scoring_rules import ScoringRules
+from tests.factories import message
+
+EMOJIS = ["👍", "🔥", "😂", "👎", "🇦", "🇧", "💯"]
+# Weights that add up exactly, so the matrix's sums tie wherever Python's do
+RULES = ScoringRules(strong_positive_weight=1.5)
+
+
+def random_cache(seed: int, count: int = 300) -> ChannelCache:
+    rng = random.Random(seed)
+    messages = []
+    for message_id in range(1000, 1000 + count):
+        reactions = {emoji: rng.randint(1, 4) for emoji in rng.sample(EMOJIS, rng.randint(0, 3))}
+        messages.append(message(message_id, reactions, media=rng.random() < 0.3))
+    return ChannelCache(count, messages)
+
+
+def brute_force(cache, show, limit=None, scored=False, include_set=None, exclude_set=None, only_set=None,
+                has_media=False, since_id=None, until_id=None, rules=None):
+    """Score every message in the window directly and sort: highest score, then newest, first."""
+    window = [m for m in cache.snapshot() if until_id is None or m.id <= until_id]
+    if limit:
+        window = window[-limit:]
+    ranked = []
+    for msg in window:
+        names = {r.emoji.name for r in msg.reactions}
+        if (since_id and msg.id < since_id) or (has_media and not msg.has_media):
+            continue
+        if (include_set and not names & include_set) or (exclude_set and names & exclude_set):
+            continue
+        if scored:
+            score = ReactionProcessor.calculate_score(msg, only_set, rules)
+            if score <= 0:
+                continue
+        else:
+            score = sum(r.count for r in msg.reactions if not only_set or r.emoji.name in only_set)
+        ranked.append((msg.id, score))
+    ranked.sort(key=lambda item: (-item[1], -item[0]))
+    return ranked[:show]
+
+
+QUERIES = [
+    {},
+    {"scored": True},
+    {"limit": 50},
+    {"limit": 50, "until_id": 1200},
+    {"since_id": 1250},
+    {"since_id": 1100, "until_id": 1150, "scored": True},
+    {"has_media": True, "include_set": {"🔥", "😂"}},
+    {"exclude_set": {"👎"}, "scored": True},
+    {"only_set": {"👍", "🔥"}},
+    {"only_set": {"🔥", "👎", "🇦"}, "scored": True, "rules": RULES},
+    {"only_set": {"👍"}, "limit": 40, "include_set": {"😂"}, "exclude_set": {"💯"}, "has_media": True, "rules": RULES},
+]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_brute_force(seed, query):
+    cache = random_cache(seed)
+    for show in (1, 10, 300):
+        ranked = FetchReactionsCog.rank_messages(cache, show, **query)
+        assert [(msg.id, score) for msg, score in ranked] == brute_force(cache, show, **query)
@@ -0,0 +1,78 @@
+import asyncio
+from benchmarks import events
+from benchmarks.synthetic import GUILD_ID, make_guild
+from util.channel_cache import ChannelCache
+from tests.factories import CHANNEL_ID, message, stop_bot
+
+def reaction_event(message_id: int, name: str, emoji_id: int = None) -> dict:
+    emoji = {"id": str(emoji_id) if emoji_id else None, "name": name}
+    return {"channel_id": str(CHANNEL_ID), "message_id": str(message_id), "guild_id": str(GUILD_ID), "user_id": "5", "emoji": emoji}
+
+
+def counts(msg) -> dict:
+    return {r.display or r.name: r.count for r in msg.reactions}
+
+
+def with_cache(start_bot, scenario):
+    async def run():
+        bot, _ = await start_bot()
+        try:
+            make_guild(bot._connection)
+            cache = ChannelCache(100, [message(1, {"👍": 2}), message(2, {"👍": 1, "🔥": 1})])
+            bot.channel_messages.put(GUILD_ID, CHANNEL_ID, cache)
+            bot.synced_channels.add(CHANNEL_ID)
+            await scenario(bot, cache)
+        finally:
+            await stop_bot(bot)
+    asyncio.run(run())
+
+
+def test_adds_and_removes_apply_without_a_fetch(start_bot):
+    async def scenario(bot, cache):
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(2, "👍"))
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(2, "👍"))
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(2, "😂"))
+        await events.dispatch(bot, "MESSAGE_REACTION_REMOVE", reaction_event(2, "🔥"))
+        assert counts(cache.get(2)) == {"👍": 3, "😂": 1}
+        assert list(cache.leaderboards["count"].top(1)) == [(2, 4)]
+        assert sum(cache.tally.emojis.values()) == 6
+        assert bot.rest_calls_saved == 4
+
+        # Removing a reaction the cache never saw doesn't go negative
+        await events.dispatch(bot, "MESSAGE_REACTION_REMOVE", reaction_event(1, "💯"))
+        assert counts(cache.get(1)) == {"👍": 2}
+
+        await bot.saver.drain()
+        stored = bot.store.load_channel(CHANNEL_ID, 1)[0]
+        assert counts(stored) == {"👍": 3, "😂": 1}
+    with_cache(start_bot, scenario)
+
+
+def test_clears(start_bot):
+    async def scenario(bot, cache):
+        await events.dispatch(bot, "MESSAGE_REACTION_REMOVE_EMOJI", reaction_event(2, "🔥"))
+        assert counts(cache.get(2)) == {"👍": 1}
+        clear = reaction_event(1, "👍")
+        del clear["emoji"], clear["user_id"]
+        await events.dispatch(bot, "MESSAGE_REACTION_REMOVE_ALL", clear)
+        assert cache.get(1).reactions == ()
+        assert cache.leaderboards["count"].score(1) == 0
+        assert list(cache.tally.top_emojis(5))[0][1] == 1
+    with_cache(start_bot, scenario)
+
+
+def test_custom_emojis_with_the_same_name_stay_apart(start_bot):
+    # The guild has a :pog: the bot can see; another server's :pog: can't be resolved or rendered
+    async def scenario(bot, cache):
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(1, "pog", 900000000000000002))
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(1, "pog", 900000000000000099))
+        await events.dispatch(bot, "MESSAGE_REACTION_REMOVE", reaction_event(1, "pog", 900000000000000099))
+        assert [(r.name, r.count) for r in cache.get(1).reactions] == [("👍", 2), ("pog", 1)]
+    with_cache(start_bot, scenario)
+
+
+def test_events_for_uncached_messages_are_ignored(start_bot):
+    async def scenario(bot, cache):
+        await events.dispatch(bot, "MESSAGE_REACTION_ADD", reaction_event(3, "👍"))
+        assert 3 not in cache and bot.rest_calls_saved == 0
+    with_cache(start_bot, scenario)
@@ -0,0 +1,55 @@
+from util.cached_message import EMOJI_TABLE
+from util.reaction_tally import ReactionTally
+from tests.factories import message
+
+def emoji(name):
+    return EMOJI_TABLE.intern(name, name).id
+
+
+def tally_of(*messages):
+    tally = ReactionTally()
+    for msg in messages:
+        tally.update(msg)
+    return tally
+
+
+def test_update_replaces_a_messages_contribution():
+    tally = tally_of(message(1, {"👍": 2, "🔥": 1}, author_id=7), message(2, {"👍": 3}, author_id=8))
+    assert tally.emojis[emoji("👍")] == 5 and tally.authors == {7: 3, 8: 3}
+    tally.update(message(1, {"🔥": 4}, author_id=7))
+    assert tally.emojis[emoji("👍")] == 3 and tally.emojis[emoji("🔥")] == 4
+    assert tally.author_emojis[7] == {emoji("🔥"): 4}
+    tally.remove(2)
+    assert emoji("👍") not in tally.emojis and 8 not in tally.authors and 8 not in tally.author_emojis
+
+
+def test_attach_adds_to_the_parent_and_forwards_changes():
+    guild = ReactionTally()
+    first = tally_of(message(1, {"👍": 2}, author_id=7))
+    second = tally_of(message(2, {"👍": 3, "🔥": 1}, author_id=8))
+    first.attach(guild)
+    second.attach(guild)
+    assert guild.emojis == {emoji("👍"): 5, emoji("🔥"): 1}
+    assert guild.authors == {7: 2, 8: 4}
+
+    first.update(message(3, {"🔥": 2}, author_id=7))
+    second.remove(2)
+    assert guild.emojis == {emoji("👍"): 2, emoji("🔥"): 2}
+    assert guild.author_emojis == {7: {emoji("👍"): 2, emoji("🔥"): 2}}
+
+
+def test_detach_takes_back_exactly_what_was_added():
+    guild = ReactionTally()
+    stays = tally_of(message(1, {"👍": 2}, author_id=7))
+    leaves = tally_of(message(2, {"👍": 3}, author_id=7))
+    stays.attach(guild)
+    leaves.attach(guild)
+    leaves.update(message(3, {"🔥": 1}, author_id=9))
+    leaves.detach()
+    assert leaves.parent is None
+    assert guild.emojis == {emoji("👍"): 2} and guild.authors == {7: 2} and guild.author_emojis == {7: {emoji("👍"): 2}}
+
+    # Changes after detaching stay local, and attaching twice doesn't count twice
+    leaves.update(message(4, {"👍": 5}))
+    stays.attach(guild)
+    assert guild.emojis == {emoji("👍"): 2}
@@ -0,0 +1,80 @@
+import asyncio
+from util.refresh_scheduler import RefreshScheduler
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def test_requests_for_a_waiting_message_are_coalesced():
+    calls = []
+
+    async def callback(channel_id, message_id):
+        calls.append((channel_id, message_id))
+
+    async def scenario():
+        scheduler = RefreshScheduler(callback, 0.05, 2)
+        for _ in range(5):
+            scheduler.schedule(1, 10)
+        scheduler.schedule(1, 11)
+        assert scheduler.queue_depth == 2 and calls == []
+        await asyncio.sleep(0.1)
+        assert sorted(calls) == [(1, 10), (1, 11)]
+        assert scheduler.coalesce_ratio == 3.0 and scheduler.queue_depth == 0
+    run(scenario)
+
+
+def test_a_request_during_a_run_starts_another():
+    calls = []
+
+    async def scenario():
+        running, finish = asyncio.Event(), asyncio.Event()
+
+        async def callback(channel_id, message_id):
+            calls.append(message_id)
+            running.set()
+            await finish.wait()
+
+        scheduler = RefreshScheduler(callback, 0, 1)
+        scheduler.schedule(1, 10)
+        await running.wait()
+        scheduler.schedule(1, 10)
+        finish.set()
+        await asyncio.sleep(0.01)
+        assert calls == [10, 10]
+    run(scenario)
+
+
+def test_concurrency_is_per_channel():
+    active, peak = {}, {}
+
+    async def callback(channel_id, message_id):
+        active[channel_id] = active.get(channel_id, 0) + 1
+        peak[channel_id] = max(peak.get(channel_id, 0), active[channel_id])
+        await asyncio.sleep(0.01)
+        active[channel_id] -= 1
+
+    async def scenario():
+        scheduler = RefreshScheduler(callback, 0, 2)
+        for message_id in range(6):
+            scheduler.schedule(1, message_id)
+            scheduler.schedule(2, message_id)
+        await asyncio.sleep(0.1)
+        assert peak == {1: 2, 2: 2} and scheduler.executed == 12
+    run(scenario)
+
+
+def test_drain_runs_pending_work_now_and_failures_dont_stop_it():
+    calls = []
+
+    async def callback(channel_id, message_id):
+        calls.append(message_id)
+        if message_id == 10:
+            raise RuntimeError("fetch failed")
+
+    async def scenario():
+        scheduler = RefreshScheduler(callback, 60, 1)
+        scheduler.schedule(1, 10)
+        scheduler.schedule(1, 11)
+        await scheduler.drain()
+        assert calls == [10, 11] and scheduler.queue_depth == 0
+    run(scenario)
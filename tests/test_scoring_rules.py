@@ -0,0 +1,44 @@
+import json
+from util.cached_message import EMOJI_TABLE
+from util.scoring_rules import NEGATIVE, NEUTRAL, POSITIVE, STRONG_POSITIVE, ScoringRegistry, ScoringRules
+
+def weight(rules, name, display=None):
+    emoji = EMOJI_TABLE.intern(name, display or name)
+    return rules.weight_table()[emoji.id]
+
+
+def test_builtin_rules():
+    rules = ScoringRules()
+    assert (weight(rules, "👎"), weight(rules, "🇦"), weight(rules, "🔥"), weight(rules, "👍")) == (-1, 0, 1.1, 1)
+    assert weight(rules, "fuckyes", "<:fuckyes:1>") == 1.1
+
+
+def test_negative_beats_neutral_beats_strong_positive():
+    rules = ScoringRules(negative={"clash"}, neutral={"clash", "calm"}, strong_positive={"clash", "calm", "hype"})
+    classes = [rules.classify(EMOJI_TABLE.intern(name, f"<:{name}:1>")) for name in ("clash", "calm", "hype", "other")]
+    assert classes == [NEGATIVE, NEUTRAL, STRONG_POSITIVE, POSITIVE]
+
+
+def test_explicit_weights_override_the_classes():
+    rules = ScoringRules(weights={"👎": 0.5, "<:pog:2>": 3})
+    assert weight(rules, "👎") == 0.5
+    assert weight(rules, "pog", "<:pog:2>") == 3
+    assert weight(rules, "pog", "<:pog:3>") == 1
+
+
+def test_from_dict_inherits_what_it_leaves_out():
+    base = ScoringRules.from_dict({"negative": ["clown"], "strong_positive_weight": 2, "weights": {"pog": 2}})
+    rules = ScoringRules.from_dict({"neutral": [], "weights": {"kek": 0.5}}, base)
+    assert rules.negative == {"clown"} and rules.neutral == frozenset() and rules.strong_positive == base.strong_positive
+    assert rules.strong_positive_weight == 2 and rules.weights == {"pog": 2, "kek": 0.5}
+    assert (weight(rules, "clown"), weight(rules, "👎"), weight(rules, "🇦"), weight(rules, "🔥")) == (-1, 1, 1, 2)
+
+
+def test_registry_loads_the_default_and_guild_overrides(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"default": {"strong_positive": ["hype"]}, "5": {"negative": ["hype"]}}), encoding="utf-8")
+    registry = ScoringRegistry()
+    registry.load(str(path))
+    assert weight(registry.for_guild(6), "hype") == 1.1
+    assert weight(registry.for_guild(5), "hype") == -1
+    assert weight(registry.for_guild(5), "🔥") == 1
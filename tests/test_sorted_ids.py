@@ -0,0 +1,39 @@
+import random
+from bisect import bisect_right, insort
+import pytest
+from util.sorted_ids import SortedIds
+
+def test_matches_a_sorted_list():
+    rng = random.Random(0)
+    ids, expected = SortedIds(load=4), []
+    for _ in range(5000):
+        action = rng.random()
+        if action < 0.5 or not expected:
+            value = rng.randrange(100000)
+            if value not in expected:
+                ids.add(value)
+                insort(expected, value)
+        elif action < 0.7:
+            value = rng.choice(expected)
+            ids.remove(value)
+            expected.remove(value)
+        elif action < 0.8:
+            assert ids.popleft() == expected.pop(0)
+        else:
+            value = rng.randrange(100000)
+            assert ids.bisect_right(value) == bisect_right(expected, value)
+        assert len(ids) == len(expected)
+    assert list(ids) == expected
+    assert list(reversed(ids)) == expected[::-1]
+    assert [ids[i] for i in range(len(expected))] == expected
+    assert (ids.first, ids.last, ids[-1]) == (expected[0], expected[-1], expected[-1])
+
+
+def test_empty():
+    ids = SortedIds()
+    assert len(ids) == 0 and ids.first is None and ids.last is None
+    assert ids.bisect_right(5) == 0
+    with pytest.raises(IndexError):
+        ids[0]
+    with pytest.raises(ValueError):
+        ids.remove(5)
@@ -0,0 +1,33 @@
+import asyncio
+from benchmarks.fakes import FakeInteraction, SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID, run_top
+from benchmarks.synthetic import make_channel, make_guild
+from config import config
+from tests.factories import stop_bot
+
+def test_a_warm_channel_isnt_evicted_while_top_waits_on_discord(start_bot, monkeypatch):
+    async def scenario():
+        bot, cog = await start_bot()
+        try:
+            guild = make_guild(bot._connection)
+            channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "busy", SyntheticTextChannel, count=500)
+            await run_top(cog, channel, 0)
+
+            # The memory budget shrinks and the periodic check runs while /top's first followup is in flight
+            interaction = FakeInteraction(channel)
+            send = interaction.followup.send
+
+            async def send_during_memory_check(*args, **kwargs):
+                monkeypatch.setattr(config, "CACHE_MAX_MESSAGES", 100)
+                monkeypatch.setattr(config, "CACHE_IDLE_MINUTES", 0)
+                await cog.memory_loop()
+                return await send(*args, **kwargs)
+            interaction.followup.send = send_during_memory_check
+
+            await cog.get_top_reaction_posts.callback(cog, interaction)
+            assert len(interaction.last_message.embeds) > 0
+            assert channel.id in bot.channel_messages
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import asyncio
+import discord
+from benchmarks.fakes import SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID, run_top
+from benchmarks.synthetic import make_channel, make_guild, message_id_at
+from slash_commands.fetch_reactions import NO_MATCHES
+from tests.factories import stop_bot
+
+def date_of(index: int) -> str:
+    return discord.utils.snowflake_time(message_id_at(index)).isoformat()
+
+
+def with_channel(start_bot, scenario):
+    """A 5000-message channel under a 1000-message cache."""
+    async def run():
+        bot, cog = await start_bot(1000)
+        try:
+            guild = make_guild(bot._connection)
+            channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "window", SyntheticTextChannel, count=5000)
+            await scenario(cog, channel)
+        finally:
+            await stop_bot(bot)
+    asyncio.run(run())
+
+
+def test_until_before_the_cached_history_says_so(start_bot):
+    async def scenario(cog, channel):
+        _, interaction = await run_top(cog, channel, 0, until=date_of(2000))
+        reply = interaction.last_message
+        assert reply.embeds == []
+        assert reply.content.startswith("Only the newest 1000 messages") and "nothing from this window" in reply.content
+    with_channel(start_bot, scenario)
+
+
+def test_since_before_the_cached_history_notes_the_truncation(start_bot):
+    async def scenario(cog, channel):
+        _, interaction = await run_top(cog, channel, 0, since=date_of(2000))
+        reply = interaction.last_message
+        assert reply.embeds
+        assert "older posts from this window aren't included" in reply.content
+
+        _, interaction = await run_top(cog, channel, 0, since=date_of(4500))
+        assert interaction.last_message.embeds and interaction.last_message.content == ""
+    with_channel(start_bot, scenario)
+
+
+def test_no_matches_sends_text_instead_of_an_empty_message(start_bot):
+    async def scenario(cog, channel):
+        _, interaction = await run_top(cog, channel, 0, include="🦆")
+        assert interaction.last_message.content == NO_MATCHES and interaction.last_message.embeds == []
+    with_channel(start_bot, scenario)
@@ -0,0 +1,30 @@
+import asyncio
+from benchmarks.fakes import SyntheticTextChannel
+from benchmarks.harness import FIRST_CHANNEL_ID, run_top
+from benchmarks.synthetic import make_channel, make_guild, message_id_at
+from config import config
+from tests.factories import stop_bot
+
+def test_background_crawl_stops_at_the_request_budget(start_bot, monkeypatch):
+    monkeypatch.setattr(config, "WARMUP_REQUEST_BUDGET", 5)
+
+    async def scenario():
+        bot, cog = await start_bot()
+        try:
+            guild = make_guild(bot._connection)
+            channel = make_channel(bot._connection, guild, FIRST_CHANNEL_ID, "warm", SyntheticTextChannel, count=1000)
+            await cog.fetch_messages(channel, background=True)
+            cache = bot.channel_messages[channel.id]
+            assert channel.requests == cog.warmup_requests == 5
+            assert len(cache) == 500 and cache.newest_id == message_id_at(1000)
+            assert channel.id not in bot.synced_channels
+            assert bot.store.load_channel(channel.id, 1) == []
+
+            # The next crawl starts over from the top, like a cold one
+            await run_top(cog, channel, 0)
+            assert len(cache) == 1000 and channel.id in bot.synced_channels
+            assert cache.covers(0)
+        finally:
+            await stop_bot(bot)
+
+    asyncio.run(scenario())
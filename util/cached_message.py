@@ -0,0 +1,159 @@
+import sys
+import threading
+import discord
+
+MEDIA_EMBED_TYPES = ("image", "video", "gifv")
+DISCORD_EPOCH_MS = 1420070400000
+
+def emoji_name(emoji) -> str:
+    """Return a matchable name for an emoji: the character itself for Unicode, or the name for custom."""
+    if isinstance(emoji, str):
+        return emoji
+    return emoji.name if hasattr(emoji, 'name') else None
+
+def format_emoji(emoji) -> str:
+    """Return a formatted string for an emoji, or None if it's unrenderable."""
+    if isinstance(emoji, str):
+        return emoji
+    if isinstance(emoji, discord.PartialEmoji) and emoji.is_unicode_emoji():
+        return emoji.name
+    if isinstance(emoji, discord.Emoji) and emoji.available:
+        return f"<a:{emoji.name}:{emoji.id}>" if emoji.animated else f"<:{emoji.name}:{emoji.id}>"
+    return None
+
+class Emoji:
+    """An interned emoji: one instance per distinct (name, display) pair."""
+    __slots__ = ("id", "name", "display")
+
+    def __init__(self, id: int, name: str, display: str):
+        self.id = id              # Dense integer id, usable as an array index
+        self.name = name          # Matchable name: the character for Unicode, the name for custom emojis
+        self.display = display    # Renderable form, or None if the emoji can't be shown
+
+
+class EmojiTable:
+    """Interns emojis so every cached reaction shares one Emoji per distinct emoji.
+
+    New emojis are added under a lock, since the store loads messages on worker threads.
+    """
+
+    def __init__(self):
+        self._by_key = {}
+        self.emojis = []
+        self._lock = threading.Lock()
+
+    def intern(self, name: str, display: str) -> Emoji:
+        key = (name, display)
+        emoji = self._by_key.get(key)
+        if emoji is None:
+            with self._lock:
+                emoji = self._by_key.get(key)
+                if emoji is None:
+                    emoji = Emoji(len(self.emojis), name, display)
+                    self.emojis.append(emoji)
+                    self._by_key[key] = emoji
+        return emoji
+
+    def intern_emoji(self, emoji) -> Emoji:
+        """Intern a str, discord.Emoji or discord.PartialEmoji."""
+        return self.intern(emoji_name(emoji), format_emoji(emoji))
+
+    def __len__(self):
+        return len(self.emojis)
+
+
+EMOJI_TABLE = EmojiTable()
+
+class CachedReaction:
+    """A single emoji tally on a cached message."""
+    __slots__ = ("emoji", "count")
+
+    def __init__(self, emoji: Emoji, count: int):
+        self.emoji = emoji
+        self.count = count
+
+    @property
+    def name(self) -> str:
+        return self.emoji.name
+
+    @property
+    def display(self) -> str:
+        return self.emoji.display
+
+    @classmethod
+    def from_reaction(cls, reaction: discord.Reaction) -> "CachedReaction":
+        return cls(EMOJI_TABLE.intern_emoji(reaction.emoji), reaction.count)
+
+
+class CachedMessage:
+    """The parts of a discord.Message that ranking and rendering need."""
+    __slots__ = ("id", "channel_id", "guild_id", "author_id", "content", "image_url",
+                 "has_attachments", "has_embed_media", "reactions")
+
+    def __init__(self, id: int, channel_id: int, guild_id: int, author_id: int, content: str,
+                 image_url: str = None, has_attachments: bool = False,
+                 has_embed_media: bool = False, reactions: tuple = ()):
+        self.id = id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.author_id = author_id
+        self.content = content
+        self.image_url = image_url
+        self.has_attachments = has_attachments
+        self.has_embed_media = has_embed_media
+        self.reactions = tuple(reactions) if reactions else ()
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "CachedMessage":
+        return cls(
+            id=message.id,
+            channel_id=message.channel.id,
+            guild_id=message.guild.id if message.guild else None,
+            author_id=message.author.id,
+            content=message.content,
+            image_url=message.attachments[0].url if message.attachments else None,
+            has_attachments=bool(message.attachments),
+            has_embed_media=any(
+                e.type in MEDIA_EMBED_TYPES or e.image or e.thumbnail or e.video
+                for e in message.embeds
+            ),
+            reactions=[CachedReaction.from_reaction(r) for r in message.reactions],
+        )
+
+    def apply_reaction(self, emoji: Emoji, delta: int):
+        """Add `delta` to the count of an emoji, dropping the reaction once it reaches zero.
+
+        Emojis are interned, so identity tells apart custom emojis that share a name across servers.
+        """
+        for reaction in self.reactions:
+            if reaction.emoji is emoji:
+                reaction.count += delta
+                if reaction.count <= 0:
+                    self.clear_reaction(emoji)
+                return
+        if delta > 0:
+            self.reactions += (CachedReaction(emoji, delta),)
+
+    def clear_reaction(self, emoji: Emoji):
+        self.reactions = tuple(r for r in self.reactions if r.emoji is not emoji)
+
+    def estimated_size(self) -> int:
+        """Approximate bytes held by this record, its strings and its reactions (emojis are shared and not counted)."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.id) + sys.getsizeof(self.content) + sys.getsizeof(self.reactions)
+        if self.image_url:
+            size += sys.getsizeof(self.image_url)
+        return size + sum(sys.getsizeof(r) + sys.getsizeof(r.count) for r in self.reactions)
+
+    @property
+    def created_at(self) -> float:
+        """Creation time as a UNIX timestamp, derived from the snowflake id."""
+        return ((self.id >> 22) + DISCORD_EPOCH_MS) / 1000
+
+    @property
+    def has_media(self) -> bool:
+        return self.has_attachments or self.has_embed_media
+
+    @property
+    def jump_url(self) -> str:
+        guild = self.guild_id if self.guild_id is not None else "@me"
+        return f"https://discord.com/channels/{guild}/{self.channel_id}/{self.id}"
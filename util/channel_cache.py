@@ -0,0 +1,164 @@
+from itertools import islice
+from util.cached_message import CachedMessage
+from util.leaderboard import Leaderboard
+from util.reaction_matrix import ReactionMatrix
+from util.reaction_processor import ReactionProcessor
+from util.reaction_tally import ReactionTally
+from util.sorted_ids import SortedIds
+
+# Rough cost of one message's entries in the sorted ids, the id index, both leaderboards and the reaction tally
+INDEX_BYTES_PER_MESSAGE = 400
+
+class ChannelCache:
+    """The cached messages of one channel, in chronological order and indexed by id.
+
+    Messages newer than everything cached are appended and, once max_size is
+    reached, the oldest ones are evicted. Lookups and replacements go through
+    the id index, and a Leaderboard per scoring mode and a ReactionTally of
+    emoji and author totals are kept in step. Since
+    snowflake ids grow with time, the sorted ids double as the time index.
+    """
+
+    def __init__(self, max_size: int, messages=()):
+        self.max_size = max_size
+        self._ids = SortedIds()  # Message ids, oldest first
+        self._by_id = {}
+        # Bumped on every change so snapshots like the reaction matrix know when they're stale
+        self.version = 0
+        self._matrix = None
+        self._matrix_version = None
+        self._bytes = 0
+        self._bytes_version = None
+        self.leaderboards = {
+            "count": Leaderboard(lambda msg: sum(r.count for r in msg.reactions)),
+            "scored": Leaderboard(ReactionProcessor.calculate_score),
+        }
+        self.tally = ReactionTally()
+        for message in messages:
+            self.add(message)
+        # Every message of the channel with an id >= covered_since is cached (None: nothing is known yet)
+        self.covered_since = self.oldest_id
+        # ...up to synced_through. Live messages past it may sit above history posted while the bot was away
+        self.synced_through = self.newest_id
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, message_id: int):
+        return message_id in self._by_id
+
+    def get(self, message_id: int) -> CachedMessage:
+        return self._by_id.get(message_id)
+
+    @property
+    def newest_id(self) -> int:
+        return self._ids.last
+
+    @property
+    def oldest_id(self) -> int:
+        return self._ids.first
+
+    def add(self, message: CachedMessage) -> bool:
+        """Insert or replace a message. Returns False if it's older than a full cache's window."""
+        if message.id in self._by_id:
+            self._by_id[message.id] = message
+            self.reindex(message)
+            return True
+
+        if len(self._ids) >= self.max_size and message.id < self._ids.first:
+            return False
+        self._ids.add(message.id)
+        self._by_id[message.id] = message
+        self.reindex(message)
+
+        if len(self._ids) > self.max_size:
+            self.trim(self.max_size)
+        return True
+
+    def trim(self, keep: int):
+        """Drop all but the newest `keep` messages."""
+        if len(self._ids) <= keep:
+            return
+        while len(self._ids) > keep:
+            self._unindex(self._ids.popleft())
+        self.covered_since = self.oldest_id
+
+    def admits(self, message_id: int) -> bool:
+        """Whether a message arriving outside a crawl (a gateway event or refetch) can be cached without hiding a gap.
+
+        Messages older than the covered range would become the new oldest_id with the history in
+        between never fetched, so they're left for a backfill to reach.
+        """
+        if message_id in self._by_id:
+            return True
+        floor = self.covered_since if self.covered_since is not None else self.newest_id
+        return floor is not None and message_id >= floor
+
+    def covers(self, since_id: int) -> bool:
+        """Whether the cache holds every message from since_id on, or is already as deep as it can get."""
+        if len(self) >= self.max_size:
+            return True
+        return self.covered_since is not None and since_id >= self.covered_since
+
+    def reindex(self, message: CachedMessage):
+        """Re-score a message after its reactions changed in place."""
+        self.version += 1
+        for leaderboard in self.leaderboards.values():
+            leaderboard.update(message)
+        self.tally.update(message)
+
+    def rescore(self):
+        """Rebuild the scored leaderboard, after the scoring rules of the channel's guild changed."""
+        self.version += 1
+        self.leaderboards["scored"] = Leaderboard(ReactionProcessor.calculate_score)
+        for message in self._by_id.values():
+            self.leaderboards["scored"].update(message)
+
+    def _unindex(self, message_id: int) -> CachedMessage:
+        self.version += 1
+        for leaderboard in self.leaderboards.values():
+            leaderboard.remove(message_id)
+        self.tally.remove(message_id)
+        return self._by_id.pop(message_id)
+
+    def remove(self, message_id: int) -> CachedMessage:
+        if message_id not in self._by_id:
+            return None
+        self._ids.remove(message_id)
+        return self._unindex(message_id)
+
+    def nth_newest_id(self, n: int, until_id: int = None) -> int:
+        """Return the id of the n-th newest message at or before until_id, or the oldest one if fewer are cached."""
+        end = self._ids.bisect_right(until_id) if until_id is not None else len(self._ids)
+        return self._ids[max(end - n, 0)] if self._ids else None
+
+    def matrix(self) -> ReactionMatrix:
+        """Return a ReactionMatrix of the whole cache, rebuilt only if something changed since the last call."""
+        if self.fresh_matrix() is None:
+            self.set_matrix(ReactionMatrix(self.snapshot()), self.version)
+        return self._matrix
+
+    def fresh_matrix(self) -> ReactionMatrix:
+        """The last built ReactionMatrix if nothing changed since, else None."""
+        return self._matrix if self._matrix is not None and self._matrix_version == self.version else None
+
+    def set_matrix(self, matrix: ReactionMatrix, version: int):
+        """Keep a matrix built elsewhere (e.g. on a worker thread) from the snapshot taken at `version`, unless the cache changed since."""
+        if version == self.version:
+            self._matrix = matrix
+            self._matrix_version = version
+
+    def snapshot(self) -> list:
+        """Every cached message, oldest first, as a list that later changes to the cache don't affect."""
+        return [self._by_id[message_id] for message_id in self._ids]
+
+    def recent(self, limit: int = None) -> list:
+        """Return the newest `limit` messages (all of them if None), newest first."""
+        return [self._by_id[message_id] for message_id in islice(reversed(self._ids), limit)]
+
+    def estimated_bytes(self) -> int:
+        """Approximate memory held by the cached messages and their indexes, recomputed only after changes."""
+        if self._bytes_version != self.version:
+            self._bytes = sum(m.estimated_size() for m in self._by_id.values()) + INDEX_BYTES_PER_MESSAGE * len(self)
+            self._bytes_version = self.version
+        return self._bytes + (self._matrix.nbytes if self._matrix is not None else 0)
@@ -8,11 +8,11 @@ MAX_EMBEDS_PER_MESSAGE = 10
 
 class EmbedUtils:
     @staticmethod
-    def create_embed(description: str, attachments=None) -> discord.Embed:
-        """Create and return a Discord Embed with optional attachments."""
+    def create_embed(description: str, image_url: str = None) -> discord.Embed:
+        """Create and return a Discord Embed with an optional image."""
         embed = discord.Embed(description=description)
-        if attachments:
-            embed.set_image(url=attachments[0].url)
+        if image_url:
+            embed.set_image(url=image_url)
         return embed
 
     @staticmethod
@@ -0,0 +1,49 @@
+from bisect import bisect_left, insort
+
+class Leaderboard:
+    """Message ids of one channel kept sorted by score, highest first.
+
+    Entries are (-score, -id) tuples in a sorted list, so ties go to the newer
+    message like the stable sort over newest-first history did. Updating one
+    message is a binary search plus a list insert/delete, and reading the top K
+    walks only as far as it needs to.
+    """
+
+    def __init__(self, score_fn):
+        self.score_fn = score_fn
+        self._entries = []
+        self._scores = {}   # message id -> score currently in _entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, message):
+        self.remove(message.id)
+        score = self.score_fn(message)
+        self._scores[message.id] = score
+        insort(self._entries, (-score, -message.id))
+
+    def remove(self, message_id: int):
+        score = self._scores.pop(message_id, None)
+        if score is None:
+            return
+        entry = (-score, -message_id)
+        index = bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+
+    def score(self, message_id: int):
+        return self._scores.get(message_id)
+
+    def top(self, k: int, predicate=None, min_score=None):
+        """Yield (message_id, score) for the k best ids passing `predicate`, best first."""
+        found = 0
+        for negative_score, negative_id in self._entries:
+            if found >= k:
+                return
+            score = -negative_score
+            if min_score is not None and score <= min_score:
+                return
+            if predicate is None or predicate(-negative_id):
+                found += 1
+                yield -negative_id, score
@@ -0,0 +1,61 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from util.metrics import EVENT_LOOP_LAG_SECONDS
+
+class LoopLagMonitor:
+    """Measures event loop lag: how much later than asked a sleep of `interval` seconds wakes up.
+
+    Lag is time the loop spent on other callbacks without yielding, during which
+    gateway heartbeats and events wait too. Each measurement goes to the
+    EVENT_LOOP_LAG_SECONDS histogram, and the most recent ones are kept for
+    percentiles.
+    """
+
+    def __init__(self, interval: float = 0.1, keep: int = 10000):
+        self.interval = interval
+        self.lags = deque(maxlen=keep)
+        self.worst = 0.0
+        self._reset_at = 0.0
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def reset(self):
+        """Forget past measurements, including the part of a pending one that came before the reset."""
+        self.lags.clear()
+        self.worst = 0.0
+        self._reset_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - max(due, self._reset_at))
+            self.lags.append(lag)
+            self.worst = max(self.worst, lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    def percentile(self, share: float) -> float:
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+    def stats(self) -> str:
+        return (f"p50 {self.percentile(0.5) * 1000:.1f} ms, p99 {self.percentile(0.99) * 1000:.1f} ms, "
+                f"worst {self.worst * 1000:.1f} ms over {len(self.lags)} samples")
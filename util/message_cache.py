@@ -0,0 +1,152 @@
+import logging
+import time
+from collections import OrderedDict
+from util.channel_cache import ChannelCache
+from util.reaction_tally import ReactionTally
+
+logger = logging.getLogger()
+
+class MessageCache:
+    """Every cached channel, partitioned by guild.
+
+    Channel lookups go through a flat id index. Each guild's channels live in
+    their own partition, ordered from least to most recently used, and a
+    guild over its message cap gives up its least recently used channels, so
+    one busy community can't push another's channels out of memory. On top of
+    that, enforce_budget keeps all guilds together under a global budget.
+    Each guild also has a ReactionTally that its channels' tallies feed into.
+    A channel mapped to None failed to load and is skipped.
+    """
+
+    def __init__(self, guild_max_messages: int):
+        self.guild_max_messages = guild_max_messages
+        self._guilds = {}     # guild id -> OrderedDict(channel id -> ChannelCache or None)
+        self._guild_of = {}   # channel id -> guild id
+        self._last_used = {}  # channel id -> time.monotonic() of its last use
+        self._tallies = {}    # guild id -> ReactionTally of all its cached channels
+
+    def __contains__(self, channel_id: int):
+        return channel_id in self._guild_of
+
+    def __getitem__(self, channel_id: int) -> ChannelCache:
+        return self._guilds[self._guild_of[channel_id]][channel_id]
+
+    def get(self, channel_id: int, default=None) -> ChannelCache:
+        guild_id = self._guild_of.get(channel_id)
+        if guild_id is None:
+            return default
+        return self._guilds[guild_id][channel_id]
+
+    def put(self, guild_id: int, channel_id: int, cache: ChannelCache):
+        previous = self.get(channel_id)
+        if previous is not None and previous is not cache:
+            previous.tally.detach()
+        if cache is not None and previous is not cache:
+            cache.tally.attach(self.tally(guild_id))
+        self._guilds.setdefault(guild_id, OrderedDict())[channel_id] = cache
+        self._guild_of[channel_id] = guild_id
+        self._last_used[channel_id] = time.monotonic()
+
+    def discard(self, channel_id: int):
+        cache = self.get(channel_id)
+        if cache is not None:
+            cache.tally.detach()
+        self._last_used.pop(channel_id, None)
+        guild_id = self._guild_of.pop(channel_id, None)
+        if guild_id is not None:
+            del self._guilds[guild_id][channel_id]
+
+    def guild_of(self, channel_id: int) -> int:
+        return self._guild_of.get(channel_id)
+
+    def touch(self, channel_id: int):
+        """Mark a channel as just used."""
+        guild_id = self._guild_of.get(channel_id)
+        if guild_id is not None:
+            self._guilds[guild_id].move_to_end(channel_id)
+            self._last_used[channel_id] = time.monotonic()
+
+    def idle_seconds(self, channel_id: int) -> float:
+        return time.monotonic() - self._last_used[channel_id]
+
+    def tally(self, guild_id: int) -> ReactionTally:
+        """Reaction totals over every cached channel of a guild."""
+        return self._tallies.setdefault(guild_id, ReactionTally())
+
+    def guild_ids(self) -> list:
+        return list(self._guilds)
+
+    def channels(self, guild_id: int = None) -> dict:
+        """Return {channel id: ChannelCache} for one guild, or for every guild, skipping failed channels."""
+        partitions = [self._guilds.get(guild_id, {})] if guild_id is not None else self._guilds.values()
+        return {channel_id: cache for partition in partitions for channel_id, cache in partition.items() if cache is not None}
+
+    def message_count(self, guild_id: int = None) -> int:
+        return sum(len(cache) for cache in self.channels(guild_id).values())
+
+    def estimated_bytes(self, guild_id: int = None) -> int:
+        return sum(cache.estimated_bytes() for cache in self.channels(guild_id).values())
+
+    def least_recently_used(self) -> list:
+        """Return (channel id, ChannelCache) for every loaded channel, least recently used first."""
+        return sorted(self.channels().items(), key=lambda item: self._last_used[item[0]])
+
+    def over_guild_cap(self, guild_id: int, keep: set = frozenset()) -> list:
+        """Return the least recently used channels of a guild that must go to bring it under its cap."""
+        excess = self.message_count(guild_id) - self.guild_max_messages
+        evict = []
+        for channel_id, cache in self._guilds.get(guild_id, {}).items():
+            if excess <= 0:
+                break
+            if cache is None or channel_id in keep:
+                continue
+            evict.append(channel_id)
+            excess -= len(cache)
+        return evict
+
+    def enforce_budget(self, max_messages: int, max_bytes: int, idle_seconds: float, trim_to: int, keep: set = frozenset()) -> list:
+        """Shrink the cache of all guilds together to max_messages and max_bytes (0 means no limit).
+
+        Going from least to most recently used, channels idle for idle_seconds are dropped whole first,
+        then the others are trimmed to their newest trim_to messages, and then dropped too. Channels in
+        `keep` are left alone. Trims happen here; the returned channel ids are for the caller to evict.
+        """
+        messages = self.message_count()
+        size = self.estimated_bytes() if max_bytes else 0
+
+        def over():
+            return (max_messages and messages > max_messages) or (max_bytes and size > max_bytes)
+
+        def release(cache):
+            nonlocal messages, size
+            messages -= len(cache)
+            if max_bytes:
+                size -= cache.estimated_bytes()
+
+        if not over():
+            return []
+        candidates = [(channel_id, cache) for channel_id, cache in self.least_recently_used() if channel_id not in keep]
+        evict = {}  # Used as an ordered set
+        for channel_id, cache in candidates:
+            if not over():
+                return list(evict)
+            if self.idle_seconds(channel_id) >= idle_seconds:
+                release(cache)
+                evict[channel_id] = True
+        for channel_id, cache in candidates:
+            if not over():
+                return list(evict)
+            if channel_id not in evict and len(cache) > trim_to:
+                release(cache)
+                cache.trim(trim_to)
+                messages += len(cache)
+                if max_bytes:
+                    size += cache.estimated_bytes()
+                logger.info(f"Trimmed channel {channel_id} to its newest {trim_to} messages")
+        for channel_id, cache in candidates:
+            if not over():
+                break
+            if channel_id not in evict:
+                release(cache)
+                evict[channel_id] = True
+        return list(evict)
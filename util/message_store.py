@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+import logging
+from util.cached_message import CachedMessage, CachedReaction, EMOJI_TABLE
+
+logger = logging.getLogger()
+
+# Largest value of an SQLite INTEGER, above every snowflake
+MAX_SNOWFLAKE = 2**63 - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    author_id INTEGER,
+    created_at REAL,
+    content TEXT,
+    image_url TEXT,
+    has_attachments INTEGER NOT NULL DEFAULT 0,
+    has_embed_media INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages (channel_id, id);
+CREATE TABLE IF NOT EXISTS reactions (
+    message_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    display TEXT,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (message_id, position)
+);
+CREATE TABLE IF NOT EXISTS channel_usage (
+    channel_id INTEGER PRIMARY KEY,
+    last_used REAL NOT NULL
+);
+"""
+
+class MessageStore:
+    """SQLite-backed persistence for cached messages and their reaction counts.
+
+    Methods are synchronous; call them through asyncio.to_thread from the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def save_messages(self, messages: list):
+        """Insert or replace messages together with their reactions."""
+        if not messages:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(m.id, m.channel_id, m.guild_id, m.author_id, m.created_at, m.content,
+                  m.image_url, int(m.has_attachments), int(m.has_embed_media)) for m in messages],
+            )
+            self._conn.executemany("DELETE FROM reactions WHERE message_id = ?", [(m.id,) for m in messages])
+            self._conn.executemany(
+                "INSERT INTO reactions VALUES (?, ?, ?, ?, ?)",
+                [(m.id, i, r.name, r.display, r.count) for m in messages for i, r in enumerate(m.reactions)],
+            )
+
+    def delete_messages(self, message_ids: list):
+        """Forget deleted messages and their reactions."""
+        if not message_ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM messages WHERE id = ?", [(message_id,) for message_id in message_ids])
+            self._conn.executemany("DELETE FROM reactions WHERE message_id = ?", [(message_id,) for message_id in message_ids])
+
+    def trim_channel(self, channel_id: int, keep: int):
+        """Drop everything but the newest `keep` messages of a channel."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM messages WHERE channel_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (channel_id, keep),
+            ).fetchone()
+            if row is None:
+                return
+            self._conn.execute(
+                "DELETE FROM reactions WHERE message_id IN (SELECT id FROM messages WHERE channel_id = ? AND id <= ?)",
+                (channel_id, row[0]),
+            )
+            self._conn.execute("DELETE FROM messages WHERE channel_id = ? AND id <= ?", (channel_id, row[0]))
+
+    def load_channel(self, channel_id: int, limit: int, before_id: int = None) -> list:
+        """Return the newest `limit` stored messages of a channel older than before_id (if given), newest first."""
+        if limit <= 0:
+            return []
+        before_id = before_id if before_id is not None else MAX_SNOWFLAKE
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM messages WHERE channel_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (channel_id, before_id, limit),
+            ).fetchall()
+            if not rows:
+                return []
+            reaction_rows = self._conn.execute(
+                "SELECT r.message_id, r.name, r.display, r.count FROM reactions r "
+                "JOIN (SELECT id FROM messages WHERE channel_id = ? AND id < ? ORDER BY id DESC LIMIT ?) m "
+                "ON r.message_id = m.id ORDER BY r.message_id, r.position",
+                (channel_id, before_id, limit),
+            ).fetchall()
+
+        reactions = {}
+        for message_id, name, display, count in reaction_rows:
+            reactions.setdefault(message_id, []).append(CachedReaction(EMOJI_TABLE.intern(name, display), count))
+
+        return [
+            CachedMessage(
+                id=row[0], channel_id=row[1], guild_id=row[2], author_id=row[3], content=row[5] or "",
+                image_url=row[6], has_attachments=bool(row[7]), has_embed_media=bool(row[8]),
+                reactions=reactions.get(row[0]),
+            )
+            for row in rows
+        ]
+
+    def mark_used(self, channel_ids: list, used_at: float):
+        """Record when channels were last used by a command, so a restart can load the recently used ones first."""
+        if not channel_ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO channel_usage VALUES (?, ?)", [(channel_id, used_at) for channel_id in channel_ids])
+
+    def channels_by_use(self) -> list:
+        """Return (channel_id, guild_id, stored messages) for every stored channel, most recently used first.
+
+        Channels no command has used yet come last, most recently active first.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT m.channel_id, m.guild_id, m.messages FROM "
+                "(SELECT channel_id, MAX(guild_id) AS guild_id, COUNT(*) AS messages, MAX(id) AS newest FROM messages GROUP BY channel_id) m "
+                "LEFT JOIN channel_usage u ON u.channel_id = m.channel_id "
+                "ORDER BY u.last_used IS NULL, u.last_used DESC, m.newest DESC"
+            ).fetchall()
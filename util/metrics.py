@@ -0,0 +1,179 @@
+import contextlib
+import re
+import time
+from bisect import bisect_left
+import aiohttp
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}   # label values tuple -> count
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self._values.items()]
+
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, callback, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.kind = kind
+
+    def render(self) -> list:
+        return [f"{self.name} {self.callback()}"]
+
+
+class Histogram:
+    """Counts observations into cumulative buckets, Prometheus style, optionally split by labels."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values tuple -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, callback, kind: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, callback, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+COMMAND_STAGE_SECONDS = METRICS.histogram(
+    "topreactions_command_stage_seconds", "Time spent in each stage of a slash command.", ("command", "stage"))
+FETCH_STAGE_SECONDS = METRICS.histogram(
+    "topreactions_fetch_stage_seconds", "Time spent in each stage of filling a channel's cache.", ("stage",))
+GATEWAY_EVENTS = METRICS.counter(
+    "topreactions_gateway_events_total", "Gateway events received, by type.", ("event",))
+REST_REQUESTS = METRICS.counter(
+    "topreactions_rest_requests_total", "Discord REST requests, by route and response status.", ("method", "route", "status"))
+REST_SECONDS = METRICS.histogram(
+    "topreactions_rest_request_seconds", "Latency of Discord REST requests, by route.", ("method", "route"))
+REST_RATE_LIMITED = METRICS.counter(
+    "topreactions_rest_rate_limited_total", "Discord REST responses with status 429, by route.", ("route",))
+EVENT_LOOP_LAG_SECONDS = METRICS.histogram(
+    "topreactions_event_loop_lag_seconds", "How late the event loop ran a timer; time other work blocked the loop.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+# Ids and interaction tokens in REST paths, folded so each route is a single label value
+_ROUTE_PATTERNS = [(re.compile(r"^/api/v\d+"), ""), (re.compile(r"/\d+"), "/:id"), (re.compile(r"(/webhooks/:id)/[^/]+"), r"\1/:token")]
+
+def route_label(path: str) -> str:
+    for pattern, replacement in _ROUTE_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """An aiohttp trace that records every Discord REST request the bot makes."""
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        route = route_label(params.url.path)
+        REST_SECONDS.observe(time.perf_counter() - context.start, method=params.method, route=route)
+        REST_REQUESTS.inc(method=params.method, route=route, status=params.response.status)
+        if params.response.status == 429:
+            REST_RATE_LIMITED.inc(route=route)
+
+    async def on_request_exception(session, context, params):
+        REST_REQUESTS.inc(method=params.method, route=route_label(params.url.path), status="error")
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+async def start_metrics_server(host: str, port: int, profiler=None) -> web.AppRunner:
+    """Serve /metrics, and /profile when a StackSampler is given, on host:port."""
+    async def metrics(request):
+        return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8")
+
+    async def profile(request):
+        return web.Response(text=profiler.collapsed(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    if profiler is not None:
+        app.router.add_get("/profile", profile)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
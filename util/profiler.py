@@ -0,0 +1,63 @@
+import sys
+import threading
+from collections import Counter
+
+class StackSampler:
+    """Statistical profiler for the event loop thread.
+
+    A daemon thread wakes every `interval` seconds and records the loop
+    thread's current Python stack, so the cost while running is one stack walk
+    per sample and nothing at all while stopped. Results are collapsed stacks
+    (`outer;inner count`), the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval: float = 0.01, thread_id: int = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        self.stacks.clear()
+        self.samples = 0
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def hottest(self, n: int = 10) -> list:
+        """Return (function, share of samples) for the n functions most often on top of the stack."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [(function, count / self.samples) for function, count in leaves.most_common(n)] if self.samples else []
@@ -0,0 +1,38 @@
+class QueryCache:
+    """Remembers /top rankings per channel until that channel's cache changes.
+
+    Entries are tagged with the ChannelCache they were computed from and its
+    version counter, which every message add, reaction update and eviction
+    bumps, so any change to the channel invalidates its cached queries.
+    """
+
+    def __init__(self, max_queries_per_channel: int = 32):
+        self.max_queries_per_channel = max_queries_per_channel
+        self._channels = {}   # channel id -> (ChannelCache, version, {query key: result})
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, channel_id: int, cache, key):
+        entry = self._channels.get(channel_id)
+        if entry is not None and entry[0] is cache and entry[1] == cache.version and key in entry[2]:
+            self.hits += 1
+            return entry[2][key]
+        self.misses += 1
+        return None
+
+    def put(self, channel_id: int, cache, key, result):
+        entry = self._channels.get(channel_id)
+        if entry is None or entry[0] is not cache or entry[1] != cache.version:
+            entry = self._channels[channel_id] = (cache, cache.version, {})
+        results = entry[2]
+        results[key] = result
+        if len(results) > self.max_queries_per_channel:
+            del results[next(iter(results))]
+
+    def discard(self, channel_id: int):
+        self._channels.pop(channel_id, None)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate), {len(self._channels)} channels"
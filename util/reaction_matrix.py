@@ -0,0 +1,71 @@
+import numpy as np
+from util.cached_message import EMOJI_TABLE
+from util.scoring_rules import SCORING_RULES, ScoringRules
+
+# The emoji table can grow on another thread between two vector builds, so a query
+# reads len(EMOJI_TABLE) once and builds every vector to that size
+
+def emoji_weights(rules: ScoringRules = None, size: int = None) -> np.ndarray:
+    """Score weight of the first `size` interned emojis (all if None) under `rules` (the default rules if None), indexed by Emoji.id."""
+    weights = (rules or SCORING_RULES.default).weight_array()
+    if size is None or len(weights) == size:
+        return weights
+    if len(weights) > size:
+        return weights[:size]
+    # Emojis interned after the array was built can't be in the matrix being scored
+    return np.concatenate((weights, np.zeros(size - len(weights))))
+
+def name_mask(names: set, size: int = None) -> np.ndarray:
+    """True for each of the first `size` interned emojis (all if None) whose matchable name is in `names`."""
+    size = len(EMOJI_TABLE) if size is None else size
+    return np.fromiter((e.name in names for e in EMOJI_TABLE.emojis[:size]), dtype=bool, count=size)
+
+
+class ReactionMatrix:
+    """Columnar snapshot of a channel's reactions for batched scoring.
+
+    Row i is the i-th message oldest first. Reactions are kept as sparse
+    (row, emoji id, count) coordinates, so a per-message sum under any emoji
+    weight vector is one np.bincount.
+    """
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.size = len(messages)
+        self.ids = np.fromiter((m.id for m in messages), dtype=np.int64, count=self.size)
+        self.has_media = np.fromiter((m.has_media for m in messages), dtype=bool, count=self.size)
+
+        rows, cols, counts = [], [], []
+        for row, message in enumerate(messages):
+            for reaction in message.reactions:
+                rows.append(row)
+                cols.append(reaction.emoji.id)
+                counts.append(reaction.count)
+        self.rows = np.array(rows, dtype=np.int64)
+        self.cols = np.array(cols, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.has_media.nbytes + self.rows.nbytes + self.cols.nbytes + self.counts.nbytes
+
+    def sums(self, weights: np.ndarray) -> np.ndarray:
+        """Per-message sum of count * weight[emoji]."""
+        return np.bincount(self.rows, weights=self.counts * weights[self.cols], minlength=self.size)
+
+    def has_any(self, mask: np.ndarray) -> np.ndarray:
+        """Per-message flag: does it have at least one reaction whose emoji is set in `mask`."""
+        return np.bincount(self.rows, weights=mask[self.cols], minlength=self.size) > 0
+
+    def top(self, scores: np.ndarray, k: int, row_mask: np.ndarray) -> list:
+        """Return (message, score) for the k best `row_mask` rows, highest score then newest first."""
+        candidates = np.flatnonzero(row_mask)
+        if k <= 0 or len(candidates) == 0:
+            return []
+        if len(candidates) > k:
+            candidate_scores = scores[candidates]
+            # Keep everything tied with the k-th best so the tie-break below stays exact
+            kth = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[candidate_scores >= kth]
+        order = np.lexsort((-self.ids[candidates], -scores[candidates]))[:k]
+        return [(self.messages[i], float(scores[i])) for i in candidates[order]]
@@ -1,69 +1,57 @@
 import re
-import discord
+from functools import lru_cache
+from util.cached_message import CachedMessage
+from util.scoring_rules import NEUTRAL_EMOJIS, NEGATIVE_EMOJIS, STRONG_POSITIVE_EMOJIS, STRONG_POSITIVE_WEIGHT, SCORING_RULES, ScoringRules
 
-# Regional indicator letters (🇦–🇿) used as poll options — excluded from scoring
-NEUTRAL_EMOJIS = {chr(c) for c in range(0x1F1E6, 0x1F200)}
-
-# Emojis that count negatively toward a message's score
-NEGATIVE_EMOJIS = {"👎", "🤮", "🙅‍♂️", "🤢"}
-
-# Emojis that count with extra weight (by Unicode character or custom emoji name)
-STRONG_POSITIVE_EMOJIS = {"🔥", "fuckyes"}
-STRONG_POSITIVE_WEIGHT = 1.1
+CUSTOM_EMOJI_PATTERN = re.compile(r'<a?:(\w+):\d+>')
 
 class ReactionProcessor:
     @staticmethod
-    def parse_emoji_input(emoji_str: str) -> set:
+    @lru_cache(maxsize=256)
+    def parse_emoji_input(emoji_str: str) -> frozenset:
         """Normalize space-separated user emoji input into a set of matchable names.
 
         Handles raw unicode (👍), Discord custom format (<:name:id>), and colon format (:name:).
         """
         names = set()
         for token in emoji_str.split():
-            match = re.match(r'<a?:(\w+):\d+>', token)
+            match = CUSTOM_EMOJI_PATTERN.match(token)
             if match:
                 names.add(match.group(1))
             elif token.startswith(':') and token.endswith(':') and len(token) > 2:
                 names.add(token[1:-1])
             else:
                 names.add(token)
-        return names
+        return frozenset(names)
 
     @staticmethod
     def get_emoji_name(reaction) -> str:
-        """Return a matchable name for an emoji: the character itself for Unicode, or the name for custom."""
-        if isinstance(reaction.emoji, str):
-            return reaction.emoji
-        return reaction.emoji.name if hasattr(reaction.emoji, 'name') else None
+        """Return the matchable name of a cached reaction."""
+        return reaction.emoji.name
 
     @staticmethod
-    def calculate_score(message: discord.Message, only_set: set = None) -> float:
-        """Calculate a weighted score for a message.
+    def calculate_score(message: CachedMessage, only_set: set = None, rules: ScoringRules = None) -> float:
+        """Calculate a weighted score for a message under `rules`, by default its guild's ScoringRules.
 
-        - NEGATIVE_EMOJIS subtract from the score.
-        - NEUTRAL_EMOJIS are ignored entirely.
-        - STRONG_POSITIVE_EMOJIS count at STRONG_POSITIVE_WEIGHT instead of 1.
-        - Everything else counts as +1.
+        - Negative emojis subtract from the score.
+        - Neutral emojis are ignored entirely.
+        - Strong positive emojis count at the rules' strong_positive_weight instead of 1.
+        - Everything else counts as +1, unless the rules give the emoji its own weight.
         - If only_set is provided, only reactions whose name is in that set are considered.
         """
+        weights = (rules or SCORING_RULES.for_guild(message.guild_id)).weight_table()
         score = 0
-        for reaction in message.reactions:
-            name = ReactionProcessor.get_emoji_name(reaction)
-            if only_set and name not in only_set:
-                continue
-            identifier = ReactionProcessor.get_emoji_str(reaction)
-            if identifier in NEGATIVE_EMOJIS:
-                score -= reaction.count
-            elif identifier in NEUTRAL_EMOJIS:
-                pass
-            elif name in STRONG_POSITIVE_EMOJIS:
-                score += reaction.count * STRONG_POSITIVE_WEIGHT
-            else:
-                score += reaction.count
+        if only_set:
+            for reaction in message.reactions:
+                if reaction.emoji.name in only_set:
+                    score += reaction.count * weights[reaction.emoji.id]
+        else:
+            for reaction in message.reactions:
+                score += reaction.count * weights[reaction.emoji.id]
         return score
 
     @staticmethod
-    def process_reactions(message: discord.Message) -> str:
+    def process_reactions(message: CachedMessage) -> str:
         """Process message reactions and return a formatted string."""
         response = ""
         unrenderable_count = 0
@@ -82,11 +70,5 @@ class ReactionProcessor:
 
     @staticmethod
     def get_emoji_str(reaction) -> str:
-        """Return a formatted string for an emoji, or None if it's unrenderable."""
-        if isinstance(reaction.emoji, str):
-            return reaction.emoji
-
-        emoji = reaction.emoji
-        if isinstance(emoji, discord.Emoji) and emoji.available:
-            return f"<a:{emoji.name}:{emoji.id}>" if emoji.animated else f"<:{emoji.name}:{emoji.id}>"
-        return None
+        """Return the renderable form of a cached reaction, or None if it's unrenderable."""
+        return reaction.emoji.display
@@ -0,0 +1,88 @@
+from collections import Counter
+from util.cached_message import EMOJI_TABLE
+
+def _add(counter: Counter, key, amount: int):
+    """Add to a Counter entry, dropping it when it reaches zero so most_common only sees live keys."""
+    value = counter[key] + amount
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class ReactionTally:
+    """Reaction counts of a set of messages, summed per emoji, per author and per (author, emoji).
+
+    A ChannelCache keeps one in step with its messages, like its leaderboards:
+    updating a message replaces the contribution remembered for its id. A
+    channel's tally can be attached to its guild's, which then receives every
+    change as well, so guild-wide questions never touch individual messages.
+    """
+
+    def __init__(self):
+        self.emojis = Counter()     # emoji id -> reactions
+        self.authors = Counter()    # author id -> reactions received
+        self.author_emojis = {}     # author id -> Counter(emoji id -> reactions)
+        self._counted = {}          # message id -> (author id, ((emoji id, count), ...)) currently included
+        self.parent = None
+
+    def update(self, message):
+        self.remove(message.id)
+        pairs = tuple((r.emoji.id, r.count) for r in message.reactions if r.count > 0)
+        if pairs:
+            self._counted[message.id] = (message.author_id, pairs)
+            self._apply(message.author_id, pairs, 1)
+
+    def remove(self, message_id: int):
+        counted = self._counted.pop(message_id, None)
+        if counted is not None:
+            self._apply(*counted, -1)
+
+    def _apply(self, author_id: int, pairs: tuple, sign: int):
+        author_emojis = self.author_emojis.setdefault(author_id, Counter())
+        total = 0
+        for emoji_id, count in pairs:
+            _add(self.emojis, emoji_id, sign * count)
+            _add(author_emojis, emoji_id, sign * count)
+            total += count
+        _add(self.authors, author_id, sign * total)
+        if not author_emojis:
+            del self.author_emojis[author_id]
+        if self.parent is not None:
+            self.parent._apply(author_id, pairs, sign)
+
+    def _merge_into(self, other: "ReactionTally", sign: int):
+        """Add (or with sign -1, take away) all of this tally's counts to another one."""
+        for emoji_id, count in self.emojis.items():
+            _add(other.emojis, emoji_id, sign * count)
+        for author_id, count in self.authors.items():
+            _add(other.authors, author_id, sign * count)
+        for author_id, emojis in self.author_emojis.items():
+            author_emojis = other.author_emojis.setdefault(author_id, Counter())
+            for emoji_id, count in emojis.items():
+                _add(author_emojis, emoji_id, sign * count)
+            if not author_emojis:
+                del other.author_emojis[author_id]
+
+    def attach(self, parent: "ReactionTally"):
+        self.detach()
+        self._merge_into(parent, 1)
+        self.parent = parent
+
+    def detach(self):
+        if self.parent is not None:
+            self._merge_into(self.parent, -1)
+            self.parent = None
+
+    def top_emojis(self, k: int) -> list:
+        """Return (Emoji, reactions) for the k most used emojis."""
+        return [(EMOJI_TABLE.emojis[emoji_id], count) for emoji_id, count in self.emojis.most_common(k)]
+
+    def top_authors(self, k: int) -> list:
+        """Return (author id, reactions received) for the k most reacted-to authors."""
+        return self.authors.most_common(k)
+
+    def author_top_emojis(self, author_id: int, k: int) -> list:
+        """Return (Emoji, reactions) for the k emojis an author receives most."""
+        emojis = self.author_emojis.get(author_id, Counter())
+        return [(EMOJI_TABLE.emojis[emoji_id], count) for emoji_id, count in emojis.most_common(k)]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+logger = logging.getLogger()
+
+class RefreshScheduler:
+    """Debounces and deduplicates per-message work such as refetches and store writes.
+
+    A request for a message that is already waiting is folded into the pending
+    one, the callback runs `window` seconds after the first request, and each
+    channel runs at most `concurrency` callbacks at a time.
+    """
+
+    def __init__(self, callback, window: float, concurrency: int):
+        self.callback = callback  # async callback(channel_id, message_id)
+        self.window = window
+        self.concurrency = concurrency
+        self._pending = {}        # (channel_id, message_id) -> task
+        self._tasks = set()
+        self._semaphores = {}
+        self.requested = 0
+        self.executed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def coalesce_ratio(self) -> float:
+        """Requests per executed callback; 1.0 means nothing was coalesced."""
+        return self.requested / self.executed if self.executed else 0.0
+
+    def schedule(self, channel_id: int, message_id: int):
+        self.requested += 1
+        key = (channel_id, message_id)
+        if key in self._pending:
+            return
+
+        task = asyncio.create_task(self._run(key))
+        self._pending[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key):
+        await asyncio.sleep(self.window)
+        semaphore = self._semaphores.setdefault(key[0], asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            # Requests arriving from here on start a new run, since this one may already miss their changes
+            self._pending.pop(key, None)
+            await self._execute(key)
+
+    async def _execute(self, key):
+        self.executed += 1
+        try:
+            await self.callback(*key)
+        except Exception as e:
+            logger.error(f"Refresh of message {key[1]} in channel {key[0]} failed: {e}")
+
+    async def drain(self):
+        """Run every pending callback now, e.g. before shutdown."""
+        pending = list(self._pending.items())
+        self._pending.clear()
+        for key, task in pending:
+            task.cancel()
+            await self._execute(key)
+
+    def stats(self) -> str:
+        return f"{self.queue_depth} pending, {self.requested} requested, {self.executed} run, coalesce ratio {self.coalesce_ratio:.1f}"
@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+import numpy as np
+from util.cached_message import EMOJI_TABLE
+
+logger = logging.getLogger()
+
+# Regional indicator letters (🇦–🇿) used as poll options — excluded from scoring
+NEUTRAL_EMOJIS = {chr(c) for c in range(0x1F1E6, 0x1F200)}
+
+# Emojis that count negatively toward a message's score
+NEGATIVE_EMOJIS = {"👎", "🤮", "🙅‍♂️", "🤢"}
+
+# Emojis that count with extra weight (by Unicode character or custom emoji name)
+STRONG_POSITIVE_EMOJIS = {"🔥", "fuckyes"}
+STRONG_POSITIVE_WEIGHT = 1.1
+
+NEGATIVE, NEUTRAL, STRONG_POSITIVE, POSITIVE = "negative", "neutral", "strong_positive", "positive"
+
+class ScoringRules:
+    """How much one reaction of each emoji adds to a message's score.
+
+    An emoji matches a rule by its name or its rendered form, so custom emojis
+    can be listed as `name` or `<:name:id>`. Weights are worked out once per
+    interned emoji and kept in a list indexed by Emoji.id, which only
+    grows as new emojis get interned. Growing it is locked, since caches can
+    be built on worker threads.
+    """
+
+    def __init__(self, negative=NEGATIVE_EMOJIS, neutral=NEUTRAL_EMOJIS, strong_positive=STRONG_POSITIVE_EMOJIS,
+                 strong_positive_weight: float = STRONG_POSITIVE_WEIGHT, weights: dict = None):
+        self.negative = frozenset(negative)
+        self.neutral = frozenset(neutral)
+        self.strong_positive = frozenset(strong_positive)
+        self.strong_positive_weight = strong_positive_weight
+        self.weights = dict(weights or {})   # Explicit per-emoji weights, overriding the classes
+        self._weights = []
+        self._array = np.zeros(0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: dict, base: "ScoringRules" = None) -> "ScoringRules":
+        """Build rules from a JSON object; fields it leaves out are taken from `base`."""
+        base = base or cls()
+        return cls(
+            negative=data.get("negative", base.negative),
+            neutral=data.get("neutral", base.neutral),
+            strong_positive=data.get("strong_positive", base.strong_positive),
+            strong_positive_weight=float(data.get("strong_positive_weight", base.strong_positive_weight)),
+            weights={**base.weights, **{emoji: float(weight) for emoji, weight in data.get("weights", {}).items()}},
+        )
+
+    def classify(self, emoji) -> str:
+        """Return the class of an interned emoji. Negative and neutral take precedence over strong positive."""
+        keys = (emoji.name, emoji.display)
+        if any(key in self.negative for key in keys):
+            return NEGATIVE
+        if any(key in self.neutral for key in keys):
+            return NEUTRAL
+        if any(key in self.strong_positive for key in keys):
+            return STRONG_POSITIVE
+        return POSITIVE
+
+    def _weigh(self, emoji, kind: str) -> float:
+        for key in (emoji.display, emoji.name):
+            if key in self.weights:
+                return self.weights[key]
+        if kind == NEGATIVE:
+            return -1
+        if kind == NEUTRAL:
+            return 0
+        if kind == STRONG_POSITIVE:
+            return self.strong_positive_weight
+        return 1
+
+    def weight_table(self) -> list:
+        """Weight of every interned emoji, indexed by Emoji.id."""
+        if len(self._weights) < len(EMOJI_TABLE):
+            with self._lock:
+                self._extend()
+        return self._weights
+
+    def _extend(self):
+        for emoji in EMOJI_TABLE.emojis[len(self._weights):]:
+            self._weights.append(self._weigh(emoji, self.classify(emoji)))
+
+    def weight_array(self) -> np.ndarray:
+        """weight_table as a float array, for scoring over a ReactionMatrix."""
+        if len(self._array) != len(EMOJI_TABLE):
+            self._array = np.array(self.weight_table(), dtype=np.float64)
+        return self._array
+
+    def describe(self) -> str:
+        weights = ", ".join(f"{emoji}={weight:g}" for emoji, weight in self.weights.items())
+        return (f"Negative: {' '.join(sorted(self.negative)) or '-'}\n"
+                f"Neutral: {len(self.neutral)} emojis\n"
+                f"Strong positive (x{self.strong_positive_weight:g}): {' '.join(sorted(self.strong_positive)) or '-'}\n"
+                f"Weights: {weights or '-'}")
+
+
+class ScoringRegistry:
+    """The default ScoringRules plus per-guild overrides, loaded from a JSON file.
+
+    The file holds an optional "default" object and one object per guild id,
+    each with any of "negative", "neutral" and "strong_positive" (lists of
+    emojis), "strong_positive_weight" and "weights" ({emoji: weight}). Guild
+    objects override the fields they set and inherit the rest from the default.
+    """
+
+    def __init__(self):
+        self.default = ScoringRules()
+        self._guilds = {}   # guild id -> ScoringRules
+
+    def for_guild(self, guild_id: int) -> ScoringRules:
+        return self._guilds.get(guild_id, self.default)
+
+    def load(self, path: str):
+        """Replace every rule with the file's. Caches scored under the old rules need ChannelCache.rescore."""
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        default = ScoringRules.from_dict(data.get("default", {}))
+        guilds = {int(guild_id): ScoringRules.from_dict(rules, default) for guild_id, rules in data.items() if guild_id != "default"}
+        self.default, self._guilds = default, guilds
+        logger.info(f"Loaded scoring rules for {len(guilds)} guilds from {path}")
+
+
+SCORING_RULES = ScoringRegistry()
@@ -0,0 +1,95 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+
+class SortedIds:
+    """Sorted integers kept in chunks of at most 2 * load, like a flat sorted list but cheap to change anywhere.
+
+    A position is found by bisecting the chunk maxima and then the chunk, and a
+    change only shifts the elements of that one chunk, so add, remove and
+    popleft cost O(log n + load) wherever the id falls: appends of new messages,
+    prepends while backfilling older history and inserts in the middle while
+    catching up after a restart. Positional lookups walk the chunk lengths,
+    O(n / load).
+    """
+
+    def __init__(self, load: int = 512):
+        self.load = load
+        self._chunks = []
+        self._maxes = []   # Last (largest) value of each chunk
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self):
+        return (value for chunk in reversed(self._chunks) for value in reversed(chunk))
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedIds index out of range")
+        for chunk in self._chunks:
+            if index < len(chunk):
+                return chunk[index]
+            index -= len(chunk)
+
+    @property
+    def first(self) -> int:
+        return self._chunks[0][0] if self._chunks else None
+
+    @property
+    def last(self) -> int:
+        return self._maxes[-1] if self._maxes else None
+
+    def add(self, value: int):
+        if not self._chunks:
+            self._chunks.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            return
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            i -= 1
+            self._chunks[i].append(value)
+            self._maxes[i] = value
+        else:
+            insort(self._chunks[i], value)
+        self._len += 1
+        chunk = self._chunks[i]
+        if len(chunk) > 2 * self.load:
+            self._chunks[i:i + 1] = [chunk[:self.load], chunk[self.load:]]
+            self._maxes[i:i + 1] = [chunk[self.load - 1], chunk[-1]]
+
+    def remove(self, value: int):
+        i = bisect_left(self._maxes, value)
+        chunk = self._chunks[i] if i < len(self._chunks) else ()
+        j = bisect_left(chunk, value)
+        if j == len(chunk) or chunk[j] != value:
+            raise ValueError(f"{value} is not in SortedIds")
+        del chunk[j]
+        self._len -= 1
+        self._settle(i)
+
+    def popleft(self) -> int:
+        value = self._chunks[0].pop(0)
+        self._len -= 1
+        self._settle(0)
+        return value
+
+    def _settle(self, i: int):
+        """Drop chunk i if it emptied, else refresh its maximum."""
+        if self._chunks[i]:
+            self._maxes[i] = self._chunks[i][-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def bisect_right(self, value: int) -> int:
+        """Number of values <= value."""
+        i = bisect_right(self._maxes, value)
+        before = sum(len(chunk) for chunk in self._chunks[:i])
+        return before + (bisect_right(self._chunks[i], value) if i < len(self._chunks) else 0)